@@ -1,17 +1,58 @@
-from langchain_ollama import OllamaLLM
 import json
 import re
-from date_parse import parse_date, get_current_date
-from calendar_functions import construct_calendar_service, find_free_slots_for_date, create_appointment_event
-from LLM_prompts import DATE_PARSING_SYSTEM_PROMPT, SLOT_FINDER_PROMPT, BOOKING_DETAILS
+import uuid
+from date_parse import parse_date, get_current_date, parse_slot_params, extract_date_phrase
+from calendar_functions import (
+    find_free_slots_for_date,
+    find_free_slots_coalesced,
+    find_free_slots_for_calendars,
+    create_appointment_event,
+    booking_key,
+)
+from api_guard import CircuitOpenError, is_transient
+from LLM_prompts import DATE_PARSING_SYSTEM_PROMPT, BOOKING_DETAILS, DATE_PARSING_SCHEMA, BOOKING_DETAILS_SCHEMA
+from response_templates import render_response, DEFAULT_LOCALE
+from resources import get_calendar_service
+from slot_engine import SlotList
+from slot_holds import interval_still_free
 
-calendar_service = construct_calendar_service("client_secret.json")
 DEFAULT_CALENDAR_ID = "primary"
+# JSON replies are short; stop generation early. Covers the longest strings the
+# schemas in LLM_prompts allow (maxLength), so the object always closes.
+STRUCTURED_MAX_TOKENS = 256
+
+
+def __getattr__(name):
+    # Importing this module must not touch the network, disk credentials or
+    # heavy client libraries; these names are resolved on first access instead.
+    if name == "OllamaLLM":
+        from langchain_ollama import OllamaLLM
+        return OllamaLLM
+    if name == "calendar_service":
+        return get_calendar_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class BookingAgent:
-    def __init__(self, llm):
+    def __init__(self, llm, availability_index=None, response_mode="template", locale=DEFAULT_LOCALE,
+                 calendar_service=None, calendar_ids=None, booking_journal=None, slot_holds=None):
         self.llm = llm
+        # One calendar per doctor; with several, slots are searched across all of them
+        self.calendar_ids = list(calendar_ids or [DEFAULT_CALENDAR_ID])
+        # Shared, process-wide client unless a specific one is passed in;
+        # built on first calendar use, not when the agent is created
+        self._calendar_service = calendar_service
+        # "template": state-determined replies come from response_templates (milliseconds)
+        # "llm": the same replies are rephrased by generate_conversational_response
+        self.response_mode = response_mode
+        self.locale = locale
+        self.availability_index = availability_index  # optional AvailabilityIndex for instant slot reads
+        # Optional BookingJournal: bookings are journalled locally and written to the calendar in the background
+        self.booking_journal = booking_journal
+        # Optional SlotHolds: the picked slot is reserved for this session and hidden from others
+        self.slot_holds = slot_holds
+        self.session_id = uuid.uuid4().hex
+        self.last_booking_key = None  # journal key of the latest booking, see booking_status()
         self.state = 'idle'  # idle → awaiting_date → slots_found → booking-details → completed
         self.context = {
             "patient_str": None,
@@ -19,6 +60,10 @@ class BookingAgent:
             "time_str": None,
         }
         self.available_slots = []
+        self.slot_calendars = {}  # (start_minute, end_minute) -> calendar_id of the doctor free then
+        self._streaming = False  # set by process_user_input_stream
+        # How many date lookups each tier answered: deterministic parser vs LLM
+        self.date_parse_tiers = {"heuristic": 0, "llm": 0}
         self.FUNCTIONS = {
             "parse_date": parse_date,
             "get_current_date": get_current_date,
@@ -26,6 +71,12 @@ class BookingAgent:
             "create_appointment_event": create_appointment_event
         }
 
+    @property
+    def calendar_service(self):
+        if self._calendar_service is None:
+            self._calendar_service = get_calendar_service()
+        return self._calendar_service
+
     def generate_conversational_response(self, user_input: str, context: str = ""):
         """Generate natural conversational responses without code examples"""
         prompt = f"""
@@ -42,13 +93,37 @@ Guidelines:
 - Focus on being helpful for scheduling and booking
 
 Your response:"""
+        if self._streaming:
+            # Iterator of text chunks; process_user_input_stream passes them on as they arrive
+            return self.llm.stream(prompt)
         return self.llm.invoke(prompt)
 
+    def _respond(self, user_input: str, key: str, **fields):
+        """Reply for a known outcome: the rendered template, or LLM phrasing of it in 'llm' mode."""
+        text = render_response(key, self.locale, **fields)
+        if self.response_mode == "llm":
+            return self.generate_conversational_response(user_input, text)
+        return text
+
     def extract_json(self, text: str):
         m = re.search(r"\{.*\}", text, re.DOTALL)
         if not m:
             return None
-        return json.loads(m.group(0))
+        try:
+            return json.loads(m.group(0))
+        except json.JSONDecodeError:
+            return None
+
+    def invoke_structured(self, prompt: str, schema: dict):
+        """
+        Call the LLM with Ollama's schema-constrained decoding, so the reply is a
+        JSON object matching `schema` and generation stops once it closes.
+        """
+        return self.llm.invoke(
+            prompt,
+            format=schema,
+            options={"temperature": 0, "num_predict": STRUCTURED_MAX_TOKENS},
+        )
 
     def is_scheduling_request(self, user_input: str) -> bool:
         """Check if the user is asking for scheduling/availability"""
@@ -79,6 +154,9 @@ Your response:"""
 
         # Extract the list of time slot tuples from the output
         slots_list = slots_output[2]  # Third element contains the list of time slots
+        if isinstance(slots_list, SlotList):
+            # Compact minutes; slots are formatted only when displayed
+            return slots_list
 
         for slot in slots_list:
             start_time, end_time = slot
@@ -105,28 +183,45 @@ Your response:"""
         else:
             return "I'm not sure how to process that request."
 
+    def process_user_input_stream(self, user_input: str):
+        """
+        Streaming variant of process_user_input.
+
+        Yields the reply in text chunks: LLM-generated replies are streamed token
+        by token with OllamaLLM.stream, fixed replies are yielded in one piece.
+        State transitions are the same as process_user_input.
+        """
+        self._streaming = True
+        try:
+            response = self.process_user_input(user_input)
+        finally:
+            self._streaming = False
+
+        if response is None:
+            return
+        if isinstance(response, str):
+            yield response
+        else:
+            yield from response
+
     def _heuristic_parse_date(self, user_input: str):
-        """Try a quick deterministic parse: keywords, common date formats."""
-        t = user_input.lower().strip()
-        # Quick keywords
-        if any(k in t for k in ["tomorrow", "tomoz", "tomorow", "tomoro", "today"]):
-            return parse_date("tomorrow", base_date=get_current_date())
-        if "day after tomorrow" in t or "day after" in t or "day after tom" in t or "they after tomorrow" in t:
-            return parse_date("day after tomorrow", base_date=get_current_date())
-        # weekday names
-        weekdays = ["monday","tuesday","wednesday","thursday","friday","saturday","sunday","fri","mon","tue","wed","thu","sat","sun"]
-        for w in weekdays:
-            if re.search(r'\b'+re.escape(w)+r'\b', t):
-                return parse_date(w, base_date=get_current_date())
-        # numeric date patterns dd/mm, mm/dd, yyyy-mm-dd
-        m = re.search(r'(\d{1,2}[/-]\d{1,2}(?:[/-]\d{2,4})?)', t)
-        if m:
-            return parse_date(m.group(1), base_date=get_current_date())
-        # month name + day
-        m = re.search(r'((?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s*\d{1,2})', t)
-        if m:
-            return parse_date(m.group(1), base_date=get_current_date())
-        return None
+        """Deterministic parse of unambiguous date phrases only; anything else goes to the LLM."""
+        phrase = extract_date_phrase(user_input)
+        return parse_date(phrase, base_date=get_current_date()) if phrase else None
+
+    def _parse_date_tiered(self, user_input: str):
+        """
+        Resolve a date without the LLM when possible.
+
+        Returns:
+            'YYYY-MM-DD' if the deterministic parser understood the input, else None
+            (the caller then falls back to the LLM date parser).
+        """
+        result = self._heuristic_parse_date(user_input)
+        tier = "heuristic" if result is not None else "llm"
+        self.date_parse_tiers[tier] += 1
+        print(f"DEBUG: Date parse tier: {tier} (counts: {self.date_parse_tiers})")
+        return result
 
 
     def _handle_idle_state(self, user_input: str):
@@ -145,14 +240,20 @@ Your response:"""
 
     def _handle_awaiting_date_state(self, user_input: str):
         """Handle user input when waiting for a date"""
-        # Parse the date from user input
+        # Tier 1: deterministic parser, no LLM round trip
+        result = self._parse_date_tiered(user_input)
+        if result is not None:
+            self.context['date_str'] = result
+            return self._find_available_slots(user_input, result)
+
+        # Tier 2: let the LLM pick out the date phrase
         prompt = DATE_PARSING_SYSTEM_PROMPT + f"\nUser: {user_input}\nContext: User is providing a date for scheduling an appointment"
-        model_reply = self.llm.invoke(prompt)
+        model_reply = self.invoke_structured(prompt, DATE_PARSING_SCHEMA)
         print(f"Date Parser raw reply: {model_reply}")
 
         data = self.extract_json(model_reply)
         if not data:
-            return model_reply
+            return self._respond(user_input, "ask_date")
 
         # Direct response
         if "response" in data:
@@ -173,10 +274,7 @@ Your response:"""
 
                 if result is None:
                     # Still no valid date found
-                    return self.generate_conversational_response(
-                        user_input,
-                        "The user didn't provide a clear date. Gently ask for a specific date or time frame."
-                    )
+                    return self._respond(user_input, "ask_date")
                 else:
                     # Valid date found - proceed to find slots
                     self.context['date_str'] = result
@@ -186,13 +284,20 @@ Your response:"""
 
     def _handle_regular_date_request(self, user_input: str):
         """Handle non-scheduling date-related requests"""
+        result = self._parse_date_tiered(user_input)
+        if result is not None:
+            return self.generate_conversational_response(
+                user_input,
+                f"The user mentioned date {result}. Provide a helpful response."
+            )
+
         prompt = DATE_PARSING_SYSTEM_PROMPT + f"\nUser: {user_input}\n"
-        model_reply = self.llm.invoke(prompt)
+        model_reply = self.invoke_structured(prompt, DATE_PARSING_SCHEMA)
         print(f"Date Parser raw reply: {model_reply}")
 
         data = self.extract_json(model_reply)
         if not data:
-            return model_reply
+            return self.generate_conversational_response(user_input)
 
         # Direct response
         if "response" in data:
@@ -223,49 +328,177 @@ Your response:"""
 
     def _find_available_slots(self, user_input: str, parsed_date: str):
         """Find available slots for the given date"""
-        prompt = SLOT_FINDER_PROMPT + f"\nUser: {user_input}\nParsed Date: {parsed_date}\n"
-        model_reply = self.llm.invoke(prompt)
-        print(f"Slot Finder raw reply: {model_reply}")
+        # Work window and slot length ("morning", "1 hour", ...) are parsed
+        # deterministically, so a scheduling turn needs no extra LLM call here
+        params = parse_slot_params(user_input)
+        print(f"Slot params: {params}")
 
-        data = self.extract_json(model_reply)
-        if not data:
-            return model_reply
+        params['service'] = self.calendar_service
+        params['date_str'] = parsed_date
 
-        # Function call requested
-        if "action" in data and 'params' in data:
-            fn_name = data["action"]
-            params = data["params"]
-            if fn_name in self.FUNCTIONS:
-                fn = self.FUNCTIONS[fn_name]
-                if fn_name == "find_free_slots_for_date":
-                    # Add required parameters
-                    params['service'] = calendar_service
-                    params['calendar_id'] = DEFAULT_CALENDAR_ID
-                    params['date_str'] = parsed_date
-
-                    result = fn(**params)
-                    self.available_slots = self.parse_time_slots_as_tuples(result)
-                    print(f"Available slots: {self.available_slots}")
-
-                    # Transition to slots_found state
-                    self.state = 'slots_found'
-
-                    # Generate user-friendly response with available slots
-                    if self.available_slots:
-                        slots_text = ", ".join(
-                            [f"{start}-{end}" for start, end in self.available_slots[:8]])  # Show first 8 slots
-                        return self.generate_conversational_response(
-                            user_input,
-                            f"Great! I found available time slots on {parsed_date}: {slots_text}. Which time slot would you prefer?"
-                        )
-                    else:
-                        self.state = 'awaiting_date'  # Go back to ask for different date
-                        return self.generate_conversational_response(
-                            user_input,
-                            f"I'm sorry, but there are no available slots on {parsed_date}. Would you like to try a different date?"
-                        )
+        try:
+            if len(self.calendar_ids) > 1:
+                result = self._find_slots_across_calendars(params)
+            else:
+                params['calendar_id'] = self.calendar_ids[0]
+                result = None
+                if self.availability_index is not None:
+                    result = self.availability_index.lookup(**params)
+                    print(f"DEBUG: Availability index {'hit' if result is not None else 'miss'}")
+                if result is None:
+                    # Concurrent sessions asking for the same day share one lookup
+                    result = find_free_slots_coalesced(**params)
+                self.slot_calendars = {}
+        except CircuitOpenError:
+            # Calendar API is failing and nothing cached covers this lookup
+            self.state = 'awaiting_date'
+            return self._respond(user_input, "calendar_unavailable")
+        self.available_slots = self.parse_time_slots_as_tuples(result)
+        if self.slot_holds is not None and isinstance(self.available_slots, SlotList):
+            # Slots another session is about to book are not offered
+            self.available_slots = self.slot_holds.filter(self.available_slots, self.session_id, self._slot_calendar)
+        print(f"Available slots: {self.available_slots}")
+
+        # The search moves on to the next day when the requested one is full
+        if result[0]:
+            parsed_date = result[0]
+            self.context['date_str'] = parsed_date
+
+        # Transition to slots_found state
+        self.state = 'slots_found'
+
+        # Generate user-friendly response with available slots
+        if self.available_slots:
+            slots_text = ", ".join(
+                [f"{start}-{end}" for start, end in self.available_slots[:8]])  # Show first 8 slots
+            return self._respond(user_input, "slots_found", date=parsed_date, slots=slots_text)
+        else:
+            self.state = 'awaiting_date'  # Go back to ask for different date
+            return self._respond(user_input, "no_slots", date=parsed_date)
+
+    def _find_slots_across_calendars(self, params):
+        """
+        Earliest-available search over every doctor in self.calendar_ids.
 
-        return "I'm having trouble finding available slots for that date."
+        Returns the slots of the earliest day any doctor is free, in the
+        find_free_slots_for_date() shape, and records in self.slot_calendars
+        which doctor each offered slot will be booked with.
+        """
+        merged, per_calendar = find_free_slots_for_calendars(
+            params.pop('service'), params.pop('date_str'), self.calendar_ids, **params
+        )
+        self.slot_calendars = {}
+        if not merged:
+            return None, None, []
+
+        first_date = merged[0][0]
+        hours, day_slots = next(result[1:] for result in per_calendar.values() if result[0] == first_date)
+        starts, ends = [], []
+        for date_str, start, end, calendar_id in merged:
+            if date_str != first_date:
+                break
+            if (start, end) not in self.slot_calendars:  # earliest-listed doctor gets the slot
+                self.slot_calendars[(start, end)] = calendar_id
+                starts.append(start)
+                ends.append(end)
+        return first_date, hours, SlotList(day_slots.date, day_slots.tz, starts, ends)
+
+    def _slot_calendar(self, start, end):
+        """Calendar of the doctor offering the slot [start, end) minutes."""
+        return self.slot_calendars.get((start, end), self.calendar_ids[0])
+
+    def _selected_minutes(self):
+        """(start_minute, end_minute) of context['time_str'] 'HH:MM-HH:MM', or None."""
+        try:
+            start, end = (
+                int(h) * 60 + int(m)
+                for h, m in (part.strip().split(':') for part in self.context['time_str'].split('-'))
+            )
+        except (AttributeError, ValueError):
+            return None
+        return start, end
+
+    def _booking_calendar_id(self):
+        """Calendar of the doctor whose slot the patient picked."""
+        selected = self._selected_minutes()
+        if selected is None:
+            return self.calendar_ids[0]
+        return self._slot_calendar(*selected)
+
+    def select_slot(self, time_str: str):
+        """
+        Record the slot the patient picked ('HH:MM-HH:MM').
+
+        With slot holds the slot is reserved for this session; returns False
+        (and drops it from available_slots) if another session holds it already.
+        """
+        self.context['time_str'] = time_str
+        selected = self._selected_minutes()
+        if self.slot_holds is None or selected is None:
+            return True
+        if self.slot_holds.hold(self.session_id, self._slot_calendar(*selected), self.context['date_str'], *selected):
+            return True
+        self.context['time_str'] = None
+        if isinstance(self.available_slots, SlotList):
+            self.available_slots = self.slot_holds.filter(self.available_slots, self.session_id, self._slot_calendar)
+        return False
+
+    def _create_appointment(self, patient_name: str, description: str):
+        """
+        Book the selected slot for the patient.
+
+        With a booking journal the booking is only recorded locally here and the
+        journal's worker writes it to the calendar; otherwise it is inserted now.
+        With slot holds, the hold is renewed and just the selected interval is
+        re-checked against the calendar first; with a journal as well, an
+        unreachable API does not block the booking, only a busy interval does.
+        """
+        start_str, _, end_str = (part.strip() for part in self.context['time_str'].partition('-'))
+        booking = dict(
+            calendar_id=self._booking_calendar_id(),
+            patient_name=patient_name,
+            date_str=self.context['date_str'],
+            time_str=start_str,
+            description=description,
+        )
+        if end_str:
+            # book the whole slot the patient picked, not the default length
+            start_h, start_m = map(int, start_str.split(':'))
+            end_h, end_m = map(int, end_str.split(':'))
+            booking['duration_minutes'] = (end_h * 60 + end_m) - (start_h * 60 + start_m)
+
+        selected = self._selected_minutes()
+        held = self.slot_holds is not None and selected is not None
+        calendar_id, date_str = booking['calendar_id'], booking['date_str']
+        key = booking_key(calendar_id, patient_name, date_str, start_str)
+        if held:
+            if not self.slot_holds.renew(self.session_id, calendar_id, date_str, *selected):
+                raise RuntimeError("this time slot has just been taken, please choose another one")
+            try:
+                free = interval_still_free(self.calendar_service, calendar_id, date_str, *selected, event_id=key)
+            except Exception as error:
+                if self.booking_journal is None or not (isinstance(error, CircuitOpenError) or is_transient(error)):
+                    raise
+                # Google is unreachable: the pinned hold keeps the slot, and the
+                # journal's worker writes the booking once the API is back
+                print(f"DEBUG: Slot re-check skipped: {error}")
+                free = True
+            if not free:
+                raise RuntimeError("this time slot has just been taken, please choose another one")
+
+        if self.booking_journal is not None:
+            on_settled = None
+            if held:
+                # the slot stays hidden from other sessions until the journal has written the event
+                holds = self.slot_holds
+                holds.pin(self.session_id, key)
+                on_settled = lambda key, status: holds.release(key)
+            self.last_booking_key = self.booking_journal.record(**booking, on_settled=on_settled)
+            return self.last_booking_key
+        event = create_appointment_event(service=self.calendar_service, **booking)
+        if self.slot_holds is not None:
+            self.slot_holds.release(self.session_id)
+        return event
 
     def _handle_slots_found_state(self, user_input: str):
         """Handle user input when slots have been found"""
@@ -276,10 +509,7 @@ Your response:"""
         else:
             # Parse time selection from user input
             # (You might want to add time parsing logic here)
-            return self.generate_conversational_response(
-                user_input,
-                "Please select a time slot from the available options to proceed with booking."
-            )
+            return self._respond(user_input, "pick_slot")
 
     def _handle_booking_creation(self, user_input: str):
         """Handle the final step of creating the appointment"""
@@ -294,14 +524,7 @@ Your response:"""
             if self.context['patient_str']:
                 print("DEBUG: Has patient name, creating appointment directly")
                 try:
-                    result = create_appointment_event(
-                        service=calendar_service,
-                        calendar_id=DEFAULT_CALENDAR_ID,
-                        patient_name=self.context['patient_str'],
-                        date_str=self.context['date_str'],
-                        time_str=self.context['time_str'],
-                        description="Appointment booked via MediBook system"
-                    )
+                    self._create_appointment(self.context['patient_str'], "Appointment booked via MediBook system")
                     self.state = 'completed'
                     # Store the result before resetting
                     booking_result = f"✅ Appointment successfully booked for {self.context['patient_str']} on {self.context['date_str']} at {self.context['time_str']}!"
@@ -315,7 +538,7 @@ Your response:"""
                 print("DEBUG: No patient name, asking for details")
                 # Ask for patient name and description
                 prompt = BOOKING_DETAILS + f"\nUser: {user_input}\n"
-                model_reply = self.llm.invoke(prompt)
+                model_reply = self.invoke_structured(prompt, BOOKING_DETAILS_SCHEMA)
                 print(f"DEBUG: LLM reply: {model_reply}")
 
                 data = self.extract_json(model_reply)
@@ -324,10 +547,7 @@ Your response:"""
                 if not data:
                     # If no JSON returned, ask again
                     print("DEBUG: No JSON returned from LLM")
-                    return self.generate_conversational_response(
-                        user_input,
-                        "I need to know the patient's name and reason for visit to complete the booking. Could you please provide both?"
-                    )
+                    return self._respond(user_input, "ask_name_and_reason")
 
                 # Check if it's the create_appointment_event action
                 if "action" in data and data["action"] == "create_appointment_event":
@@ -343,15 +563,7 @@ Your response:"""
                         try:
                             print("DEBUG: Attempting to create appointment")
                             # Create the appointment
-                            time_to_book = self.context['time_str'].split('-')[0]
-                            result = create_appointment_event(
-                                service=calendar_service,
-                                calendar_id=DEFAULT_CALENDAR_ID,
-                                patient_name=patient_name,
-                                date_str=self.context['date_str'],
-                                time_str=time_to_book,
-                                description=description
-                            )
+                            self._create_appointment(patient_name, description)
                             self.state = 'completed'
                             # Store the result before resetting
                             booking_result = f"✅ Appointment successfully booked for {patient_name} on {self.context['date_str']} at {self.context['time_str']}! Reason: {description}"
@@ -362,20 +574,21 @@ Your response:"""
                             return f"❌ Failed to create appointment: {str(e)}"
                     else:
                         print("DEBUG: No patient name extracted from JSON")
-                        return self.generate_conversational_response(
-                            user_input,
-                            "I didn't catch the patient's name. Could you please tell me the name for the booking?"
-                        )
+                        return self._respond(user_input, "name_not_caught")
                 else:
                     # If the LLM didn't return the expected action, ask for info
                     print("DEBUG: LLM didn't return expected action")
-                    return self.generate_conversational_response(
-                        user_input,
-                        "To complete your booking, I need the patient's name. Could you please provide it?"
-                    )
+                    return self._respond(user_input, "ask_name")
         else:
             print(f"DEBUG: Missing time_str: {self.context['time_str']} or date_str: {self.context['date_str']}")
             return "I need both date and time information to create the appointment."# REMOVED: self.reset() from here - it was causing the issue
+    def booking_status(self):
+        """Journal status of the latest booking ('pending', 'done', 'failed'), or None."""
+        if self.booking_journal is None or self.last_booking_key is None:
+            return None
+        row = self.booking_journal.status(self.last_booking_key)
+        return row["status"] if row else None
+
     def reset(self):
         """Reset the agent to initial state"""
         self.state = 'idle'
@@ -385,6 +598,7 @@ Your response:"""
             "time_str": None,
         }
         self.available_slots = []
+        self.slot_calendars = {}
 
 
 # Test the agent properly
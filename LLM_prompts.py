@@ -31,6 +31,22 @@ User: "I have a fever"
 **YOUR RESPONSE (JSON ONLY):**
 """
 
+BOOKING_DETAILS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "action": {"type": "string", "enum": ["create_appointment_event"]},
+        "args": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string", "maxLength": 80},
+                "description": {"type": "string", "maxLength": 120},
+            },
+            "required": ["name"],
+        },
+    },
+    "required": ["action", "args"],
+}
+
 
 
 SLOT_FINDER_PROMPT = """
@@ -132,6 +148,36 @@ You are a helpful assistant that helps users with date-related queries. Your mai
 **IMPORTANT:** Extract the EXACT date phrase from the user's message. Don't modify it.
 """
 
+# Exactly one of "action" / "response"; an empty object is not a valid reply
+DATE_PARSING_SCHEMA = {
+    "type": "object",
+    "oneOf": [
+        {
+            "properties": {
+                "action": {
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string", "enum": ["parse_date"]},
+                        "args": {
+                            "type": "object",
+                            "properties": {"text": {"type": "string", "minLength": 1, "maxLength": 60}},
+                            "required": ["text"],
+                        },
+                    },
+                    "required": ["name", "args"],
+                },
+            },
+            "required": ["action"],
+            "additionalProperties": False,
+        },
+        {
+            "properties": {"response": {"type": "string", "minLength": 1, "maxLength": 200}},
+            "required": ["response"],
+            "additionalProperties": False,
+        },
+    ],
+}
+
 TIME_SLOT_EXTRACTOR = """
 You are a helpful assistant whose only function is to find and extract time slots, from the user's prompt
 **CRITICAL RULES:**
@@ -0,0 +1,177 @@
+import random
+import threading
+import time
+
+RATE_LIMIT_REASONS = (b"rateLimitExceeded", b"userRateLimitExceeded", b"quotaExceeded")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the API while the circuit breaker is open."""
+
+
+def http_status(error):
+    """HTTP status code of a googleapiclient/httpx error (None for other errors)."""
+    resp = getattr(error, 'resp', None)
+    status = getattr(resp, 'status', None)
+    if status is None:
+        # httpx.HTTPStatusError (async_calendar)
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return int(status) if status is not None else None
+
+
+def is_rate_limited(error):
+    """429, or a 403 whose reason is a rate/quota limit (a plain 403 is a permission error)."""
+    status = http_status(error)
+    if status == 429:
+        return True
+    if status == 403:
+        content = getattr(error, 'content', b"") or b""
+        if isinstance(content, str):
+            content = content.encode()
+        return any(reason in content for reason in RATE_LIMIT_REASONS)
+    return False
+
+
+def is_transient(error):
+    """Errors worth retrying and counting against the API's health."""
+    return (
+        is_rate_limited(error)
+        or (http_status(error) or 0) >= 500
+        or isinstance(error, OSError)  # timeouts, refused/reset connections, DNS failures
+    )
+
+
+class TokenBucket:
+    """Blocking token bucket: `rate` requests per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 1):
+        """
+        Block until `tokens` are available and take them. A cost above `capacity`
+        waits for a full bucket and leaves it in debt, so the rate still holds.
+        """
+        need = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= need:
+                    self._tokens -= tokens
+                    return
+                wait = (need - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive transient failures; while open
+    every call fails fast. After `reset_timeout` seconds one trial call is let
+    through (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        with self._lock:
+            return self._opened_at is not None and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError("Calendar API circuit is open; not calling the API")
+            # half-open: this call is the trial; restarting the clock keeps the
+            # others failing fast until it reports back (or a timeout passes)
+            self._opened_at = time.monotonic()
+            self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class ApiGuard:
+    """
+    Runs googleapiclient requests through a shared token bucket, retries
+    rate-limit and 5xx errors with jittered exponential backoff, and trips a
+    circuit breaker when the API keeps failing.
+
+    Requests marked `quota_free` (the local SQLite backend) bypass all of this.
+
+    Usage:
+        guard = ApiGuard()
+        result = guard.execute(service.events().list(calendarId="primary"))
+    """
+
+    def __init__(self, rate: float = 8.0, capacity: int = 20, max_retries: int = 4,
+                 base_delay: float = 0.5, max_delay: float = 16.0, breaker=None):
+        """
+        Args:
+            rate, capacity: token bucket refill rate (requests/s) and burst size,
+                kept under the Calendar per-user quota.
+            max_retries: retries of a rate-limited or 5xx request.
+            base_delay, max_delay: backoff bounds in seconds ("full jitter").
+            breaker: CircuitBreaker shared by every request.
+        """
+        self.bucket = TokenBucket(rate, capacity)
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff_delay(self, attempt: int):
+        """Seconds to wait before retry number `attempt` (0-based): full jitter."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def execute(self, request, cost: int = 1):
+        """
+        Run request.execute() under the guard.
+
+        Args:
+            request: googleapiclient HttpRequest or BatchHttpRequest.
+            cost: quota it uses; a batch counts once per sub-request.
+        """
+        if getattr(request, "quota_free", False):
+            # local backend (local_calendar): no quota to protect, nothing to retry
+            return request.execute()
+        for attempt in range(self.max_retries + 1):
+            self.breaker.before_call()
+            self.bucket.acquire(cost)
+            try:
+                result = request.execute()
+            except Exception as e:
+                if not is_transient(e):
+                    if http_status(e) is not None:
+                        # the API answered; a 404/409/400 says nothing about its health
+                        self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt == self.max_retries or not (is_rate_limited(e) or (http_status(e) or 0) >= 500):
+                    raise
+                time.sleep(self.backoff_delay(attempt))
+                continue
+            self.breaker.record_success()
+            return result
@@ -0,0 +1,184 @@
+import asyncio
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+import httpx
+import pytz
+
+from calendar_functions import (
+    TIMEZONE,
+    DEFAULT_CALENDAR_ID,
+    _busy_to_events,
+    _first_free_day,
+    _appointment_event_body,
+    _notify_write,
+    _http_status,
+    _is_retryable,
+    booking_key,
+    BOOKING_RETRIES,
+)
+
+CALENDAR_API_URL = "https://www.googleapis.com/calendar/v3"
+
+
+class AsyncCalendarClient:
+    """
+    Minimal asyncio Google Calendar v3 client on httpx.
+
+    Unlike the googleapiclient service, whose blocking .execute() calls share an
+    httplib2 object, one client can have dozens of requests in flight from a
+    single worker. Point `base_url` at a local fake server for tests.
+
+    Usage:
+        async with AsyncCalendarClient(lambda: creds.token) as client:
+            slots = await find_free_slots_for_date_async(client, "2025-11-26")
+    """
+
+    def __init__(self, token_provider, base_url: str = CALENDAR_API_URL,
+                 max_connections: int = 100, timeout: float = 10.0, transport=None):
+        """
+        Args:
+            token_provider: callable returning the current OAuth access token,
+                e.g. `lambda: creds.token` with google_apis.CredentialManager keeping it fresh.
+            base_url: Calendar API root.
+            max_connections: size of the keep-alive connection pool.
+            timeout: per-request timeout in seconds.
+            transport: optional httpx transport, e.g. httpx.MockTransport for a local fake.
+        """
+        self.token_provider = token_provider
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections),
+            transport=transport,
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def _request(self, method: str, path: str, **kwargs):
+        headers = {"Authorization": f"Bearer {self.token_provider()}"}
+        response = await self._client.request(method, path, headers=headers, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def list_events(self, calendar_id: str, **params):
+        """events().list equivalent; follows nextPageToken and returns all items."""
+        path = f"/calendars/{quote(calendar_id, safe='')}/events"
+        items = []
+        while True:
+            result = await self._request("GET", path, params=params)
+            items.extend(result.get('items', []))
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                return items
+            params = {**params, "pageToken": page_token}
+
+    async def insert_event(self, calendar_id: str, body: dict):
+        return await self._request("POST", f"/calendars/{quote(calendar_id, safe='')}/events", json=body)
+
+    async def get_event(self, calendar_id: str, event_id: str):
+        return await self._request("GET", f"/calendars/{quote(calendar_id, safe='')}/events/{event_id}")
+
+    async def update_event(self, calendar_id: str, event_id: str, body: dict):
+        return await self._request("PUT", f"/calendars/{quote(calendar_id, safe='')}/events/{event_id}", json=body)
+
+    async def freebusy(self, body: dict):
+        return await self._request("POST", "/freeBusy", json=body)
+
+
+async def get_events_for_date_async(client, date_str: str, calendar_id: str = DEFAULT_CALENDAR_ID):
+    """Async twin of calendar_functions.get_events_for_date()."""
+    tz = pytz.timezone(TIMEZONE)
+    date = datetime.strptime(date_str, "%Y-%m-%d").date()
+
+    start_dt = tz.localize(datetime.combine(date, datetime.min.time()))
+    end_dt = start_dt + timedelta(days=1)
+
+    return await client.list_events(
+        calendar_id,
+        timeMin=start_dt.isoformat(),
+        timeMax=end_dt.isoformat(),
+        singleEvents="true",
+        orderBy="startTime",
+    )
+
+
+async def find_free_slots_for_date_async(
+    client,
+    date_str: str,
+    calendar_id: str = DEFAULT_CALENDAR_ID,
+    work_start: str = "09:00",
+    work_end: str = "18:00",
+    slot_minutes: int = 30,
+    max_days_ahead: int = 1,
+):
+    """
+    Async twin of calendar_functions.find_free_slots_for_date().
+
+    Busy time comes from one FreeBusy request; if that fails, every day in the
+    window is listed concurrently instead of one after another.
+    """
+    tz = pytz.timezone(TIMEZONE)
+    base_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+    days = [(base_date + timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(max_days_ahead + 1)]
+
+    start_dt = tz.localize(datetime.combine(base_date, datetime.min.time()))
+    end_dt = start_dt + timedelta(days=max_days_ahead + 1)
+    try:
+        result = await client.freebusy({
+            "timeMin": start_dt.isoformat(),
+            "timeMax": end_dt.isoformat(),
+            "timeZone": TIMEZONE,
+            "items": [{"id": calendar_id}],
+        })
+        calendar = result.get('calendars', {}).get(calendar_id, {})
+        if calendar.get('errors'):
+            raise RuntimeError(f"FreeBusy failed for {calendar_id}: {calendar['errors']}")
+        busy_events = _busy_to_events(calendar.get('busy', []))
+        events_by_day = {day: busy_events for day in days}
+    except Exception as e:
+        print(f"FreeBusy query failed, falling back to per-day events: {e}")
+        results = await asyncio.gather(*(get_events_for_date_async(client, day, calendar_id) for day in days))
+        events_by_day = dict(zip(days, results))
+
+    return _first_free_day(events_by_day.__getitem__, base_date, work_start, work_end, slot_minutes, max_days_ahead)
+
+
+async def create_appointment_event_async(
+    client,
+    patient_name: str,
+    date_str: str,
+    time_str: str,
+    description: str,
+    calendar_id: str = DEFAULT_CALENDAR_ID,
+    duration_minutes: int = 30,
+    retries: int = BOOKING_RETRIES,
+):
+    """Async twin of calendar_functions.create_appointment_event(); same idempotency key and retries."""
+    event_id = booking_key(calendar_id, patient_name, date_str, time_str)
+    event_body = _appointment_event_body(patient_name, date_str, time_str, description, duration_minutes, event_id)
+
+    for attempt in range(retries + 1):
+        try:
+            created_event = await client.insert_event(calendar_id, event_body)
+            break
+        except Exception as e:
+            if _http_status(e) == 409:
+                created_event = await client.get_event(calendar_id, event_id)
+                if created_event.get("status") == "cancelled":
+                    created_event = await client.update_event(
+                        calendar_id, event_id, {**event_body, "status": "confirmed"})
+                break
+            if attempt == retries or not (_is_retryable(e) or isinstance(e, httpx.TransportError)):
+                raise
+            await asyncio.sleep(0.5 * 2 ** attempt)
+
+    _notify_write(calendar_id, date_str)
+    return created_event
@@ -0,0 +1,215 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+from calendar_functions import (
+    TIMEZONE,
+    DEFAULT_CALENDAR_ID,
+    get_busy_intervals,
+    _busy_to_events,
+    _events_to_appointments,
+    _working_hours,
+    add_write_listener,
+    remove_write_listener,
+)
+from date_parse import get_current_date
+from slot_engine import day_slot_list
+
+
+class AvailabilityIndex:
+    """
+    Ready-made free-slot table for the next `days_ahead` days, per calendar and
+    per slot length, refreshed by a background thread.
+
+    lookup() answers in the same shape as find_free_slots_for_date() and returns
+    None on a miss (day outside the window, different working hours, a day
+    invalidated since the last refresh, or no successful full refresh for
+    `max_staleness` seconds), so callers can fall back to a live query.
+    Days written by create_appointment_event() are invalidated automatically;
+    changes made directly in the calendar show up after the next full refresh.
+
+    Usage:
+        index = AvailabilityIndex(calendar_service)  # shared one from resources when None
+        index.start()
+        agent = BookingAgent(llm, availability_index=index)
+    """
+
+    def __init__(
+        self,
+        service=None,
+        calendar_ids=(DEFAULT_CALENDAR_ID,),
+        days_ahead: int = 14,
+        slot_lengths=(30, 60),
+        work_start: str = "09:00",
+        work_end: str = "18:00",
+        refresh_interval: float = 300.0,
+        max_staleness: float = 900.0,
+    ):
+        self._service = service
+        self.calendar_ids = list(calendar_ids)
+        self.days_ahead = days_ahead
+        self.slot_lengths = list(slot_lengths)
+        self.work_start = work_start
+        self.work_end = work_end
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.tz = pytz.timezone(TIMEZONE)
+
+        self._table = {}      # (calendar_id, date_str, slot_minutes) -> (hours, SlotList)
+        self._versions = {}   # (calendar_id, date_str) -> bumped on every invalidation
+        self._dirty = set()   # (calendar_id, date_str) waiting for a targeted refresh
+        self._refreshed_at = None  # time.monotonic() of the last successful full refresh
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        add_write_listener(self.invalidate)
+
+    @property
+    def service(self):
+        if self._service is None:
+            from resources import get_calendar_service
+            self._service = get_calendar_service()
+        return self._service
+
+    def start(self):
+        """
+        Fill and keep the table current in a daemon thread. lookup() misses until
+        the first refresh has succeeded, so callers query live meanwhile.
+        """
+        if self._thread is not None:
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="availability-index", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        remove_write_listener(self.invalidate)
+
+    def refresh(self):
+        """Rebuild the whole window with one FreeBusy query."""
+        started_at = time.monotonic()
+        first_day = get_current_date()
+        self._refresh_days([first_day + timedelta(days=offset) for offset in range(self.days_ahead)])
+
+        # Forget days that have rolled out of the window
+        cutoff = first_day.strftime("%Y-%m-%d")
+        with self._lock:
+            for key in [key for key in self._table if key[1] < cutoff]:
+                del self._table[key]
+            self._refreshed_at = started_at
+
+    def lookup(
+        self,
+        calendar_id: str = DEFAULT_CALENDAR_ID,
+        date_str: str = None,
+        work_start: str = "09:00",
+        work_end: str = "18:00",
+        slot_minutes: int = 30,
+        max_days_ahead: int = 1,
+        **_,
+    ):
+        """
+        Serve find_free_slots_for_date() from the index.
+
+        Returns:
+            (date_str_for_slots, hours_tuple, free_slots_list) like
+            find_free_slots_for_date(), or None if the index can't answer.
+        """
+        if work_start != self.work_start or work_end != self.work_end:
+            return None
+
+        base_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+        with self._lock:
+            if self._refreshed_at is None or time.monotonic() - self._refreshed_at > self.max_staleness:
+                # refreshes keep failing; the table may miss changes made in the calendar
+                return None
+            for offset in range(max_days_ahead + 1):
+                current_date_str = (base_date + timedelta(days=offset)).strftime("%Y-%m-%d")
+                entry = self._table.get((calendar_id, current_date_str, slot_minutes))
+                if entry is None:
+                    return None
+                hours, free_slots = entry
+                if free_slots:
+                    return current_date_str, hours, free_slots
+        return None, None, []
+
+    def invalidate(self, calendar_id: str, date_str: str):
+        """Drop a day from the index and schedule it for a targeted refresh."""
+        key = (calendar_id, date_str)
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            for slot_minutes in self.slot_lengths:
+                self._table.pop((calendar_id, date_str, slot_minutes), None)
+            if calendar_id in self.calendar_ids:
+                self._dirty.add(key)
+        self._wake.set()
+
+    def _run(self):
+        # Full refreshes run on a fixed schedule; invalidations only wake the
+        # thread early for targeted refreshes and never push the deadline back.
+        next_refresh = time.monotonic()
+        while not self._stop.is_set():
+            self._wake.wait(max(0.0, next_refresh - time.monotonic()))
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+            try:
+                self._refresh_days(sorted({datetime.strptime(d, "%Y-%m-%d").date() for _, d in dirty}))
+            except Exception as e:
+                print(f"Availability index refresh failed: {e}")
+                with self._lock:
+                    self._dirty |= dirty
+            if time.monotonic() >= next_refresh:
+                next_refresh = time.monotonic() + self.refresh_interval
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"Availability index refresh failed: {e}")
+
+    def _refresh_days(self, days):
+        if not days:
+            return
+        first_day, last_day = days[0], days[-1]
+        wanted = {day.strftime("%Y-%m-%d") for day in days}
+
+        with self._lock:
+            versions = {
+                (calendar_id, d): self._versions.get((calendar_id, d), 0)
+                for calendar_id in self.calendar_ids for d in wanted
+            }
+
+        busy = get_busy_intervals(
+            self.service,
+            first_day.strftime("%Y-%m-%d"),
+            (last_day - first_day).days + 1,
+            self.calendar_ids,
+        )
+
+        table = {}
+        for calendar_id in self.calendar_ids:
+            events = _busy_to_events(busy[calendar_id])
+            for day in days:
+                hours = _working_hours(self.tz, day, self.work_start, self.work_end)
+                appointments = _events_to_appointments(events, self.tz, hours[0], hours[1])
+                for slot_minutes in self.slot_lengths:
+                    free_slots = day_slot_list(self.tz, hours, appointments, slot_minutes)
+                    table[(calendar_id, day.strftime("%Y-%m-%d"), slot_minutes)] = (hours, free_slots)
+
+        with self._lock:
+            for (calendar_id, date_str, slot_minutes), entry in table.items():
+                # Skip days written to while we were fetching; they stay dirty
+                if self._versions.get((calendar_id, date_str), 0) != versions[(calendar_id, date_str)]:
+                    continue
+                self._table[(calendar_id, date_str, slot_minutes)] = entry
@@ -0,0 +1,246 @@
+import random
+import sqlite3
+import threading
+import time
+
+from api_guard import CircuitOpenError, is_transient
+from calendar_functions import (
+    DEFAULT_CALENDAR_ID,
+    create_appointment_event,
+    booking_key,
+    _guard,
+)
+
+
+class BookingJournal:
+    """
+    Durable write-behind queue for confirmed bookings.
+
+    record() commits the booking to a local SQLite (WAL) journal and returns at
+    once, so the patient's confirmation only waits for a local write. A daemon
+    worker then inserts journalled bookings into the calendar, retrying
+    transient failures (timeouts, 429, 5xx) with jittered exponential backoff.
+    A Google outage therefore delays bookings instead of losing or blocking them,
+    and anything still pending when the process stops is sent after a restart.
+    Bookings that fail for good are listed by failed_bookings() and passed to
+    on_failed, so someone can call the patient back.
+
+    Entries are keyed by calendar_functions.booking_key(), the same ID the
+    calendar event gets, so recording a booking twice or re-sending one whose
+    insert actually landed never creates a duplicate.
+
+    Usage:
+        journal = BookingJournal(calendar_service)
+        journal.start()
+        agent = BookingAgent(llm, booking_journal=journal)
+    """
+
+    def __init__(
+        self,
+        service=None,
+        path: str = "booking_journal.sqlite3",
+        max_attempts: int = 10,
+        base_delay: float = 2.0,
+        max_delay: float = 300.0,
+        poll_interval: float = 5.0,
+        on_failed=None,
+    ):
+        """
+        Args:
+            service: Google Calendar service; the shared one from resources when None.
+            path: SQLite journal file.
+            max_attempts: attempts before a booking is marked failed.
+            base_delay, max_delay: backoff bounds in seconds.
+            poll_interval: seconds between checks for due retries when idle.
+            on_failed: called with the journal row (see status()) of a booking
+                marked failed, e.g. to alert the practice.
+        """
+        self._service = service
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.on_failed = on_failed
+        self._on_settled = {}  # booking key -> callback passed to record()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = FULL;
+            CREATE TABLE IF NOT EXISTS bookings (
+                booking_key TEXT PRIMARY KEY,
+                calendar_id TEXT NOT NULL,
+                patient_name TEXT NOT NULL,
+                date_str TEXT NOT NULL,
+                time_str TEXT NOT NULL,
+                description TEXT NOT NULL,
+                duration_minutes INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',  -- pending | done | failed
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                event_id TEXT,
+                recorded_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS bookings_due ON bookings (status, next_attempt_at);
+            """
+        )
+        self._conn.commit()
+
+    @property
+    def service(self):
+        if self._service is None:
+            from resources import get_calendar_service
+            self._service = get_calendar_service()
+        return self._service
+
+    def record(self, patient_name: str, date_str: str, time_str: str, description: str,
+               calendar_id: str = DEFAULT_CALENDAR_ID, duration_minutes: int = 30, on_settled=None):
+        """
+        Journal a booking for the worker to send; returns its booking key.
+
+        Args are those of create_appointment_event(); time_str is the start 'HH:MM'.
+        on_settled, if given, is called as on_settled(key, status) once the
+        booking is 'done' or 'failed', e.g. to release the slot hold. It is kept
+        in memory only, so it does not survive a restart.
+
+        Recording a booking that is already journalled does nothing, except that
+        a 'failed' one is queued again as a fresh booking.
+        """
+        key = booking_key(calendar_id, patient_name, date_str, time_str)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO bookings (booking_key, calendar_id, patient_name, date_str, time_str,"
+                " description, duration_minutes, next_attempt_at, recorded_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (booking_key) DO UPDATE SET status = 'pending', attempts = 0,"
+                " description = excluded.description, duration_minutes = excluded.duration_minutes,"
+                " next_attempt_at = excluded.next_attempt_at, last_error = NULL, recorded_at = excluded.recorded_at"
+                " WHERE status = 'failed'",
+                (key, calendar_id, patient_name, date_str, time_str, description, duration_minutes, now, now),
+            )
+            self._conn.commit()
+            status = self._conn.execute("SELECT status FROM bookings WHERE booking_key = ?", (key,)).fetchone()[0]
+            if on_settled is not None and status == "pending":
+                self._on_settled[key] = on_settled
+        if on_settled is not None and status != "pending":
+            # recorded before and already settled
+            on_settled(key, status)
+        self._wake.set()
+        return key
+
+    def status(self, key: str):
+        """Journal row for `key` as a dict, or None."""
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM bookings WHERE booking_key = ?", (key,))
+            row = cursor.fetchone()
+            return dict(zip([c[0] for c in cursor.description], row)) if row else None
+
+    def failed_bookings(self):
+        """Journal rows of the bookings that could not be written, oldest first."""
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM bookings WHERE status = 'failed' ORDER BY recorded_at")
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM bookings WHERE status = 'pending'").fetchone()[0]
+
+    def flush(self):
+        """Send every booking whose retry time has come; returns how many were written."""
+        with self._lock:
+            due = self._conn.execute(
+                "SELECT booking_key, calendar_id, patient_name, date_str, time_str, description,"
+                " duration_minutes, attempts FROM bookings"
+                " WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY next_attempt_at",
+                (time.time(),),
+            ).fetchall()
+
+        written = 0
+        for key, calendar_id, patient_name, date_str, time_str, description, duration, attempts in due:
+            if self._stop.is_set():
+                break
+            try:
+                event = create_appointment_event(
+                    self.service, patient_name, date_str, time_str, description,
+                    calendar_id=calendar_id, duration_minutes=duration, retries=0,
+                )
+            except Exception as e:
+                self._record_failure(key, attempts + 1, e)
+                continue
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE bookings SET status = 'done', attempts = ?, event_id = ?, last_error = NULL"
+                    " WHERE booking_key = ?",
+                    (attempts + 1, event.get("id"), key),
+                )
+                self._conn.commit()
+            self._settle(key, "done")
+            written += 1
+        return written
+
+    def _settle(self, key, status):
+        with self._lock:
+            callback = self._on_settled.pop(key, None)
+        if callback is not None:
+            try:
+                callback(key, status)
+            except Exception as e:
+                print(f"Booking {key} settle callback failed: {e}")
+
+    def _record_failure(self, key, attempts, error):
+        if isinstance(error, CircuitOpenError):
+            # the API was never called: not an attempt, and nothing to send before the breaker resets
+            attempts -= 1
+            retryable = True
+            delay = _guard.breaker.reset_timeout
+        else:
+            retryable = is_transient(error)
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+        status = "pending" if retryable and attempts < self.max_attempts else "failed"
+        print(f"Booking {key} attempt {attempts} failed ({status}): {error}")
+        with self._lock:
+            self._conn.execute(
+                "UPDATE bookings SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?"
+                " WHERE booking_key = ?",
+                (status, attempts, time.time() + delay, str(error), key),
+            )
+            self._conn.commit()
+        if status == "failed":
+            self._settle(key, status)
+            if self.on_failed is not None:
+                try:
+                    self.on_failed(self.status(key))
+                except Exception as e:
+                    print(f"Booking {key} on_failed callback failed: {e}")
+
+    def start(self):
+        """Send journalled bookings from a daemon thread, including any left from a previous run."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="booking-journal", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Booking journal flush failed: {e}")
+            self._wake.wait(self.poll_interval)
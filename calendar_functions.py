@@ -1,12 +1,39 @@
+import hashlib
+import heapq
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 import pytz  # pip install pytz
 
 from google_apis import create_service
+from slot_engine import day_slot_list
+from single_flight import SingleFlight
+from api_guard import ApiGuard, CircuitOpenError, is_transient, http_status as _http_status
 
 TIMEZONE = 'Asia/Kolkata'
 DEFAULT_CALENDAR_ID = 'primary'   # can be changed based on calendarList()
 
+FREEBUSY_MAX_CALENDARS = 50  # calendars per FreeBusy query allowed by the API
+
+BOOKING_RETRIES = 3         # extra insert attempts on timeouts and 5xx responses
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Rate limiter, retries and circuit breaker shared by every Calendar API request
+_guard = ApiGuard()
+
+# Last good find_free_slots_for_date() answers, served while the circuit is open
+STALE_AVAILABILITY_MAX = 1024
+_last_availability = {}
+_last_availability_lock = threading.Lock()  # sessions look up and write it from many threads
+
+# In-flight availability lookups shared by identical concurrent requests
+_availability_flight = SingleFlight()
+
+# Callbacks run after create_appointment_event writes, as listener(calendar_id, date_str)
+_write_listeners = []
+
 
 
 def construct_calendar_service(client_secret_file: str):
@@ -21,6 +48,37 @@ def construct_calendar_service(client_secret_file: str):
     service = create_service(client_secret_file, api_name, service_name)
     return service
 
+def add_write_listener(listener):
+    """
+    Register listener(calendar_id, date_str), called after an appointment is written.
+    Used by caches and indexes to invalidate the day that changed.
+    """
+    _write_listeners.append(listener)
+
+
+def remove_write_listener(listener):
+    if listener in _write_listeners:
+        _write_listeners.remove(listener)
+
+
+def _execute(request, cost: int = 1):
+    """
+    Run a googleapiclient request through the shared rate limiter, backoff and circuit breaker.
+
+    cost is the quota the request uses: 1, or the number of sub-requests of a batch.
+    """
+    return _guard.execute(request, cost)
+
+
+def _notify_write(calendar_id: str, date_str: str):
+    _forget_availability(calendar_id, date_str)
+    for listener in list(_write_listeners):
+        try:
+            listener(calendar_id, date_str)
+        except Exception as e:
+            print(f"Write listener failed: {e}")
+
+
 def get_current_date():
     tz = pytz.timezone(TIMEZONE)
     current_date = datetime.now(tz=tz)
@@ -33,13 +91,13 @@ def list_calendars(service):
     Return the list of calendars the authorized account has access to.
     Useful if you want a specific calendarId instead of just 'primary'.
     """
-    results = service.calendarList().list().execute()
+    results = _execute(service.calendarList().list())
     items = results.get('items', [])
     # You can inspect 'summary' and 'id' from each item
     return items
 
 
-def get_events_for_date(service, date_str: str, calendar_id: str = DEFAULT_CALENDAR_ID):
+def get_events_for_date(service, date_str: str, calendar_id: str = DEFAULT_CALENDAR_ID, cache=None):
     """
     Get all events for a specific date from a given calendar.
 
@@ -47,26 +105,97 @@ def get_events_for_date(service, date_str: str, calendar_id: str = DEFAULT_CALEN
         service: Google Calendar API service object.
         date_str: 'YYYY-MM-DD' string.
         calendar_id: calendar ID (e.g. 'primary' or from calendarList()).
+        cache: optional event_cache.EventCache; events are then served locally
+            after an incremental sync instead of a full events().list. If the
+            sync fails because the API is down, the local copy still answers.
 
     Returns:
         List of event dicts.
     """
+    if cache is not None:
+        try:
+            cache.sync(service, calendar_id)
+        except Exception as e:
+            # the local copy is a better answer than none while the API is down
+            if not (isinstance(e, CircuitOpenError) or is_transient(e)) or not cache.has_synced(calendar_id):
+                raise
+            print(f"Event cache sync failed, answering from the local copy: {e}")
+        return cache.events_for_date(calendar_id, date_str)
+
     tz = pytz.timezone(TIMEZONE)
     date = datetime.strptime(date_str, "%Y-%m-%d").date()
 
     start_dt = tz.localize(datetime.combine(date, datetime.min.time()))
     end_dt = start_dt + timedelta(days=1)
 
-    events_result = service.events().list(
+    events_result = _execute(service.events().list(
         calendarId=calendar_id,
         timeMin=start_dt.isoformat(),
         timeMax=end_dt.isoformat(),
         singleEvents=True,
         orderBy='startTime'
-    ).execute()
+    ))
 
     return events_result.get('items', [])
 
+
+def get_busy_intervals(service, start_date_str: str, days: int = 1, calendar_ids=(DEFAULT_CALENDAR_ID,),
+                       errors=None):
+    """
+    Get busy intervals for several calendars over several days with a single FreeBusy query.
+
+    Args:
+        service: Google Calendar API service object.
+        start_date_str: 'YYYY-MM-DD' first day of the window.
+        days: number of whole days in the window.
+        calendar_ids: calendar IDs to query.
+        errors: optional dict; calendars the API reports errors for are put here
+            (calendar_id -> errors) and left out of the result instead of raising.
+
+    Returns:
+        Dict of calendar_id -> list of {"start": iso, "end": iso} busy intervals.
+        Without `errors`, raises RuntimeError if the API reports an error for any calendar.
+    """
+    tz = pytz.timezone(TIMEZONE)
+    date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+
+    start_dt = tz.localize(datetime.combine(date, datetime.min.time()))
+    end_dt = tz.localize(datetime.combine(date + timedelta(days=days), datetime.min.time()))
+
+    body = {
+        "timeMin": start_dt.isoformat(),
+        "timeMax": end_dt.isoformat(),
+        "timeZone": TIMEZONE,
+        "items": [{"id": calendar_id} for calendar_id in calendar_ids],
+    }
+    freebusy_result = _execute(service.freebusy().query(body=body))
+
+    calendars = freebusy_result.get('calendars', {})
+    busy = {}
+    for calendar_id in calendar_ids:
+        calendar = calendars.get(calendar_id, {})
+        if calendar.get('errors'):
+            if errors is None:
+                raise RuntimeError(f"FreeBusy failed for {calendar_id}: {calendar['errors']}")
+            errors[calendar_id] = calendar['errors']
+            continue
+        busy[calendar_id] = calendar.get('busy', [])
+
+    return busy
+
+
+def _busy_to_events(busy):
+    """
+    Wrap FreeBusy intervals in the event shape _events_to_appointments() expects.
+    """
+    events = []
+    for interval in busy:
+        events.append({
+            "start": {"dateTime": interval["start"].replace("Z", "+00:00")},
+            "end": {"dateTime": interval["end"].replace("Z", "+00:00")},
+        })
+    return events
+
 TIMEZONE = "Asia/Kolkata"   # or whatever you set earlier
 DEFAULT_CALENDAR_ID = "primary"
 
@@ -116,16 +245,15 @@ def _events_to_appointments(events, tz, day_start, day_end):
 
     return appointments
 
-def get_slots(hours, appointments, duration=timedelta(hours=1)):
-    free_slots = []
-    slots = sorted([(hours[0], hours[0])] + appointments + [(hours[1], hours[1])])
-    for start, end in ((slots[i][1], slots[i+1][0]) for i in range(len(slots)-1)):
-        assert start <= end, "Cannot attend all appointments"
-        while start + duration <= end:
-            #print(start, start + duration)
-            free_slots.append((start, start + duration))
-            start += duration
-    return free_slots
+def _working_hours(tz, day, work_start: str = "09:00", work_end: str = "18:00"):
+    """Localized (start, end) datetimes of the working window on `day`."""
+    start_hour, start_min = map(int, work_start.split(":"))
+    end_hour, end_min = map(int, work_end.split(":"))
+    midnight = datetime.combine(day, datetime.min.time())
+    return (
+        tz.localize(midnight.replace(hour=start_hour, minute=start_min)),
+        tz.localize(midnight.replace(hour=end_hour, minute=end_min)),
+    )
 
 def next_day_hours(hours, begin = (9,0), finish = (17,0)):
     next_day = hours[0].date() + timedelta(days=1)
@@ -143,10 +271,15 @@ def find_free_slots_for_date(
     work_end: str = "18:00",
     slot_minutes: int = 30,
     max_days_ahead: int = 1,
+    use_freebusy: bool = True,
+    cache=None,
 ):
     """
     Compute free time slots starting from a given date, within doctor's working hours.
-    Uses get_slots() and next_day_hours().
+    Uses slot_engine on each day's working window.
+
+    Busy time for the whole window is fetched with one FreeBusy query; if that
+    fails, events are fetched day by day with get_events_for_date() instead.
 
     Args:
         service: Google Calendar service.
@@ -156,64 +289,248 @@ def find_free_slots_for_date(
         work_end: working day end time in 'HH:MM'.
         slot_minutes: minimum free slot size.
         max_days_ahead: how many days ahead to search if the given day is full.
+        use_freebusy: fetch the window with one FreeBusy query instead of one events().list per day.
+        cache: optional event_cache.EventCache to answer from local data instead.
+
+    While the API circuit breaker is open, the last answer for the same lookup
+    is returned (if there is one) instead of failing.
 
     Returns:
         (date_str_for_slots, hours_tuple, free_slots_list)
-        where free_slots_list is a list of (start_datetime, end_datetime) tuples.
+        where free_slots_list is a slot_engine.SlotList: iterating it gives
+        ("HH:MM", "HH:MM") tuples, .datetimes() gives (start_datetime, end_datetime).
         If nothing found within range, returns (None, None, []).
     """
-    tz = pytz.timezone(TIMEZONE)
-
+    key = (calendar_id, date_str, work_start, work_end, slot_minutes, max_days_ahead)
+    if cache is None and _guard.breaker.is_open():
+        stale = _remembered_availability(key)
+        if stale is not None:
+            print("Calendar API unavailable, serving last known availability")
+            return stale
+    try:
+        result = _find_free_slots(service, date_str, calendar_id, work_start, work_end,
+                                  slot_minutes, max_days_ahead, use_freebusy, cache)
+    except CircuitOpenError:
+        stale = _remembered_availability(key)
+        if stale is not None:
+            print("Calendar API unavailable, serving last known availability")
+            return stale
+        raise
+    if cache is None:
+        with _last_availability_lock:
+            if len(_last_availability) >= STALE_AVAILABILITY_MAX:
+                _last_availability.pop(next(iter(_last_availability)))
+            _last_availability[key] = result
+    return result
+
+
+def _remembered_availability(key):
+    with _last_availability_lock:
+        return _last_availability.get(key)
+
+
+def _forget_availability(calendar_id, date_str):
+    """Drop remembered answers whose window covers a day that was just written."""
+    day = datetime.strptime(date_str, "%Y-%m-%d").date()
+    with _last_availability_lock:
+        for key in list(_last_availability):
+            first = datetime.strptime(key[1], "%Y-%m-%d").date()
+            if key[0] == calendar_id and first <= day <= first + timedelta(days=key[5]):
+                del _last_availability[key]
+
+
+def _find_free_slots(service, date_str, calendar_id, work_start, work_end, slot_minutes, max_days_ahead,
+                     use_freebusy, cache):
     base_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-    start_hour, start_min = map(int, work_start.split(":"))
-    end_hour, end_min = map(int, work_end.split(":"))
-    duration = timedelta(minutes=slot_minutes)
 
-    # Starting hours for the first day
-    current_hours = (
-        tz.localize(datetime.combine(base_date, datetime.min.time()).replace(hour=start_hour, minute=start_min)),
-        tz.localize(datetime.combine(base_date, datetime.min.time()).replace(hour=end_hour, minute=end_min)),
+    # One FreeBusy round trip for every day in the window
+    busy_events = None
+    if use_freebusy and cache is None:
+        try:
+            busy = get_busy_intervals(service, date_str, max_days_ahead + 1, [calendar_id])
+            busy_events = _busy_to_events(busy[calendar_id])
+        except Exception as e:
+            print(f"FreeBusy query failed, falling back to per-day events: {e}")
+
+    def events_for_day(current_date_str):
+        if busy_events is not None:
+            return busy_events
+        return get_events_for_date(service, current_date_str, calendar_id, cache=cache)
+
+    return _first_free_day(events_for_day, base_date, work_start, work_end, slot_minutes, max_days_ahead)
+
+
+def find_free_slots_coalesced(
+    service,
+    date_str: str,
+    calendar_id: str = DEFAULT_CALENDAR_ID,
+    work_start: str = "09:00",
+    work_end: str = "18:00",
+    slot_minutes: int = 30,
+    max_days_ahead: int = 1,
+    **kwargs,
+):
+    """
+    find_free_slots_for_date(), with identical concurrent lookups merged.
+
+    Sessions asking for the same (calendar, date, window, slot length) while a
+    lookup is in flight wait for it and share its result, so a burst of
+    "tomorrow" requests costs one Calendar round trip. See coalescing_stats().
+    """
+    key = (calendar_id, date_str, work_start, work_end, slot_minutes, max_days_ahead, tuple(sorted(kwargs.items())))
+    return _availability_flight.do(
+        key, find_free_slots_for_date, service, date_str, calendar_id,
+        work_start, work_end, slot_minutes, max_days_ahead, **kwargs
     )
 
+
+def coalescing_stats():
+    """requests / upstream / coalesced counts and coalescing_ratio of find_free_slots_coalesced()."""
+    return _availability_flight.stats()
+
+
+def find_free_slots_for_calendars(
+    service,
+    date_str: str,
+    calendar_ids,
+    work_start: str = "09:00",
+    work_end: str = "18:00",
+    slot_minutes: int = 30,
+    max_days_ahead: int = 1,
+    max_workers: int = 8,
+):
+    """
+    find_free_slots_for_date() for several doctors' calendars at once.
+
+    Calendars are queried with FreeBusy in groups of FREEBUSY_MAX_CALENDARS, the
+    groups running concurrently, so latency stays roughly flat as doctors are
+    added. Calendars FreeBusy can't answer (a failed group query, or errors
+    reported for that calendar alone) fall back to per-day events, also
+    concurrently. The service must be safe to share between threads (see
+    google_apis._HttpPool).
+
+    Returns:
+        (merged_slots, per_calendar)
+        merged_slots: [(date_str, start_minute, end_minute, calendar_id), ...]
+            across all doctors, earliest first; minutes are since midnight.
+        per_calendar: {calendar_id: (date_str_for_slots, hours_tuple, free_slots_list)}
+    """
+    calendar_ids = list(calendar_ids)
+    base_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+    groups = [calendar_ids[i:i + FREEBUSY_MAX_CALENDARS] for i in range(0, len(calendar_ids), FREEBUSY_MAX_CALENDARS)]
+
+    def query_group(group):
+        errors = {}
+        try:
+            busy = get_busy_intervals(service, date_str, max_days_ahead + 1, group, errors=errors)
+        except Exception as e:
+            print(f"FreeBusy query failed for {len(group)} calendars: {e}")
+            return {}
+        for calendar_id, calendar_errors in errors.items():
+            print(f"FreeBusy failed for {calendar_id}: {calendar_errors}")
+        return busy
+
+    def slots_for(calendar_id, busy):
+        if calendar_id in busy:
+            events = _busy_to_events(busy[calendar_id])
+            return _first_free_day(lambda _: events, base_date, work_start, work_end, slot_minutes, max_days_ahead)
+        return find_free_slots_for_date(
+            service, date_str, calendar_id, work_start, work_end, slot_minutes, max_days_ahead,
+            use_freebusy=False,
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        busy = {}
+        for group_busy in pool.map(query_group, groups):
+            busy.update(group_busy)
+        results = pool.map(lambda calendar_id: slots_for(calendar_id, busy), calendar_ids)
+        per_calendar = dict(zip(calendar_ids, results))
+
+    # Each doctor's slots are already sorted; heap-merge them into one timeline
+    merged_slots = list(heapq.merge(
+        *([(result[0], start, end, calendar_id) for start, end in result[2].minutes()]
+          for calendar_id, result in per_calendar.items() if result[0]),
+        key=lambda slot: (slot[0], slot[1]),
+    ))
+    return merged_slots, per_calendar
+
+
+def _first_free_day(events_for_day, base_date, work_start, work_end, slot_minutes, max_days_ahead):
+    """
+    Slot computation shared by find_free_slots_for_date() and its async twin.
+
+    Args:
+        events_for_day: callable(date_str) -> events overlapping that day.
+
+    Returns:
+        Same tuple as find_free_slots_for_date().
+    """
+    tz = pytz.timezone(TIMEZONE)
+
     for offset in range(max_days_ahead + 1):
-        # Compute current date
         current_date = base_date + timedelta(days=offset)
         current_date_str = current_date.strftime("%Y-%m-%d")
-
-        if offset > 0:
-            # Move hours to next day while keeping same time range
-            current_hours = next_day_hours(
-                current_hours,
-                begin=(start_hour, start_min),
-                finish=(end_hour, end_min),
-            )
-            # Localize (next_day_hours returns naive)
-            current_hours = (
-                tz.localize(current_hours[0]),
-                tz.localize(current_hours[1]),
-            )
-
+        current_hours = _working_hours(tz, current_date, work_start, work_end)
         day_start, day_end = current_hours
 
-        # 1. Get events for that date from Google Calendar
-        events = get_events_for_date(service, current_date_str, calendar_id)
+        # 1. Get events for that date
+        events = events_for_day(current_date_str)
 
         # 2. Convert events to appointments [(start, end), ...]
         appointments = _events_to_appointments(events, tz, day_start, day_end)
 
-        # 3. Use your get_slots() to compute free slots
-        free_slots = get_slots(
-            hours=current_hours,
-            appointments=appointments,
-            duration=duration,
-        )
+        # 3. Compute free slots as compact minute offsets
+        day_slots = day_slot_list(tz, current_hours, appointments, slot_minutes)
 
-        if free_slots:
-            return current_date_str, current_hours, free_slots
+        if day_slots:
+            return current_date_str, current_hours, day_slots
 
     # No free slots found in range
     return None, None, []
 
+
+def booking_key(calendar_id: str, patient_name: str, date_str: str, time_str: str):
+    """
+    Deterministic idempotency key for a booking, used as the Calendar event ID.
+
+    sha1 hex digits (0-9, a-f) are valid base32hex event IDs, so the same
+    booking always maps to the same event and a repeated insert gets a 409
+    instead of creating a duplicate.
+    """
+    raw = "|".join([calendar_id, " ".join(patient_name.lower().split()), date_str, time_str])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _appointment_event_body(patient_name, date_str, time_str, description, duration_minutes=30, event_id=None):
+    """Event resource for an appointment, as sent to events().insert."""
+    tz = pytz.timezone(TIMEZONE)
+    start_dt = tz.localize(
+        datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
+    )
+    end_dt = start_dt + timedelta(minutes=duration_minutes)
+
+    body = {
+        "summary": f"Appointment: {patient_name}",
+        "description": description,
+        "start": {
+            "dateTime": start_dt.isoformat(),
+            "timeZone": TIMEZONE,
+        },
+        "end": {
+            "dateTime": end_dt.isoformat(),
+            "timeZone": TIMEZONE,
+        },
+    }
+    if event_id:
+        body["id"] = event_id
+        body["extendedProperties"] = {"private": {"bookingKey": event_id}}
+    return body
+
+
+def _is_retryable(error):
+    return isinstance(error, (TimeoutError, ConnectionError)) or _http_status(error) in RETRY_STATUSES
+
+
 def create_appointment_event(
     service,
     patient_name: str,
@@ -222,10 +539,16 @@ def create_appointment_event(
     description: str,
     calendar_id: str = DEFAULT_CALENDAR_ID,
     duration_minutes: int = 30,
+    retries: int = BOOKING_RETRIES,
 ):
     """
     Create an appointment event in the doctor’s calendar.
 
+    The event ID is booking_key(), so calling this twice for the same booking
+    (a rerun, or a retry after a timeout whose insert actually landed) returns
+    the existing event instead of inserting a duplicate. That makes it safe to
+    retry timeouts and 5xx errors, which is done here with exponential backoff.
+
     Args:
         service: Google Calendar service.
         patient_name: name of patient.
@@ -234,32 +557,39 @@ def create_appointment_event(
         description: details/symptoms.
         calendar_id: which calendar to insert into.
         duration_minutes: appointment length.
+        retries: extra attempts on timeouts (rate limits and 5xx are retried by _execute).
 
     Returns:
-        The created event resource dict.
+        The created (or already existing) event resource dict.
     """
-    tz = pytz.timezone(TIMEZONE)
-    start_dt = tz.localize(
-        datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
-    )
-    end_dt = start_dt + timedelta(minutes=duration_minutes)
-
-    event_body = {
-        "summary": f"Appointment: {patient_name}",
-        "description": description,
-        "start": {
-            "dateTime": start_dt.isoformat(),
-            "timeZone": TIMEZONE,
-        },
-        "end": {
-            "dateTime": end_dt.isoformat(),
-            "timeZone": TIMEZONE,
-        },
-    }
+    event_id = booking_key(calendar_id, patient_name, date_str, time_str)
+    event_body = _appointment_event_body(patient_name, date_str, time_str, description, duration_minutes, event_id)
+
+    for attempt in range(retries + 1):
+        try:
+            created_event = _execute(service.events().insert(
+                calendarId=calendar_id,
+                body=event_body
+            ))
+            break
+        except Exception as e:
+            if _http_status(e) == 409:
+                created_event = _existing_booking(service, calendar_id, event_id, event_body)
+                break
+            # rate limits and 5xx are already retried by _execute
+            if attempt == retries or not isinstance(e, (TimeoutError, ConnectionError)):
+                raise
+            time.sleep(0.5 * 2 ** attempt)
+
+    _notify_write(calendar_id, date_str)
+    return created_event
 
-    created_event = service.events().insert(
-        calendarId=calendar_id,
-        body=event_body
-    ).execute()
 
-    return created_event
+def _existing_booking(service, calendar_id, event_id, event_body):
+    """The event already holding `event_id`; a cancelled one is restored with `event_body`."""
+    existing = _execute(service.events().get(calendarId=calendar_id, eventId=event_id))
+    if existing.get("status") == "cancelled":
+        existing = _execute(service.events().update(
+            calendarId=calendar_id, eventId=event_id, body={**event_body, "status": "confirmed"}
+        ))
+    return existing
@@ -61,10 +61,10 @@ def parse_date(text: str, base_date: get_current_date()) -> str | None:
     # Quick keywords
     if re.search(r'\btoday\b', s):
         return base.isoformat()
-    if re.search(r'\btomorrow\b', s):
-        return (base + timedelta(days=1)).isoformat()
     if re.search(r'\bday after tomorrow\b', s) or re.search(r'\bafter tomorrow\b', s):
         return (base + timedelta(days=2)).isoformat()
+    if re.search(r'\btomorrow\b', s):
+        return (base + timedelta(days=1)).isoformat()
 
     # Weekday handling: "next monday", "this fri", "monday"
     m = re.search(r'\b(?:(next|this)\s+)?(monday|tuesday|wednesday|thursday|friday|saturday|sunday|mon|tue|tues|wed|thu|thurs|fri|sat|sun)\b', s)
@@ -122,7 +122,8 @@ def parse_date(text: str, base_date: get_current_date()) -> str | None:
                 continue
 
     # Numeric day/month[/year] - assume DD/MM(/YYYY)
-    mnum = re.search(r'\b(\d{1,2})[\/\-\.\s](\d{1,2})(?:[\/\-\.\s](\d{2,4}))?\b', s)
+    # (not the month-day tail of an ISO date, which is handled below)
+    mnum = re.search(r'(?<![\d\/\-\.])\b(\d{1,2})[\/\-\.\s](\d{1,2})(?:[\/\-\.\s](\d{2,4}))?\b', s)
     if mnum:
         d_s, m_s, y_s = mnum.groups()
         try:
@@ -159,6 +160,128 @@ def parse_date(text: str, base_date: get_current_date()) -> str | None:
 
     return None
 
+# Date phrases unambiguous enough to resolve without the LLM (extract_date_phrase).
+# Month names are whitelisted and numeric dates need '/' or '-', so times like
+# "10.11" or "3 05" and counts like "2 3 hour slots" are never read as dates.
+_MONTH_NAMES = "january|february|march|april|may|june|july|august|september|october|november|december" \
+               "|jan|feb|mar|apr|jun|jul|aug|sept|sep|oct|nov|dec"
+TOMORROW_MISSPELLINGS_RE = re.compile(r'\b(?:tomoz|tomorow|tomoro|tmrw|tmr)\b')
+DAY_AFTER_TOMORROW_RE = re.compile(r'\b(?:day|they) after (?:tomorrow|tom)\b')
+DATE_KEYWORD_RE = re.compile(r'\b(?:day after tomorrow|today|tomorrow)\b')
+# "sat"/"sun" are left out: too often ordinary words
+WEEKDAY_RE = re.compile(
+    r'\b(?:(?:next|this)\s+)?(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday|mon|tues?|wed|thu(?:rs)?|fri)\b')
+DAY_MONTH_RE = re.compile(rf'\b\d{{1,2}}(?:st|nd|rd|th)?\s+(?:of\s+)?(?:{_MONTH_NAMES})\b(?:,?\s+\d{{4}}\b)?')
+# month first: not "may" ("may 2 of us come")
+MONTH_DAY_RE = re.compile(
+    rf'\b(?:{_MONTH_NAMES.replace("may|", "")})\s+\d{{1,2}}(?:st|nd|rd|th)?\b'
+    r'(?!\s*(?:years?|yrs?|hours?|hrs?|minutes?|mins?)\b)(?:,?\s+\d{4}\b)?')
+NUMERIC_DATE_RE = re.compile(
+    r'(?<![\d:.])\b(?:\d{4}-\d{1,2}-\d{1,2}|\d{1,2}[/-]\d{1,2}(?:[/-](?:\d{4}|\d{2}))?)\b'
+    r'(?![/.:-]?\d)(?!\s*(?:am|pm|hours?|hrs?|minutes?|mins?)\b)')
+# "at 10-11", "from 2-3": a time range, not a date
+TIME_RANGE_LEAD_RE = re.compile(r'\b(?:at|from|between|by|till|until|to)\s*$')
+
+
+def extract_date_phrase(text: str) -> str | None:
+    """
+    The part of `text` that names a date unambiguously, for parse_date(); None otherwise.
+
+    Recognises today/tomorrow/day after tomorrow (with common misspellings),
+    weekdays, DD/MM or DD-MM (optional year), YYYY-MM-DD and day + month name.
+    Anything else ("the day after my surgery") is left to the LLM.
+    """
+    if not text:
+        return None
+    s = TOMORROW_MISSPELLINGS_RE.sub('tomorrow', text.lower())
+    s = DAY_AFTER_TOMORROW_RE.sub('day after tomorrow', s)
+    for pattern in (DATE_KEYWORD_RE, WEEKDAY_RE, DAY_MONTH_RE, MONTH_DAY_RE):
+        m = pattern.search(s)
+        if m:
+            return m.group(0)
+    for m in NUMERIC_DATE_RE.finditer(s):
+        if not TIME_RANGE_LEAD_RE.search(s[:m.start()]):
+            return m.group(0)
+    return None
+
+# Working-window keywords -> (work_start, work_end)
+PARTS_OF_DAY = {
+    "morning": ("09:00", "12:00"),
+    "afternoon": ("12:00", "16:00"),
+    "evening": ("16:00", "18:00"),
+}
+
+TIME_BOUND_RE = re.compile(
+    r'\b(after|from|before|until|till|by)\s+(\d{1,2})(?:[:.](\d{2}))?\s*(am|pm)?\b', flags=re.I)
+HOURS_RE = re.compile(r'\b(\d+(?:\.\d+)?)\s*(?:hours?|hrs?)\b', flags=re.I)
+MINUTES_RE = re.compile(r'\b(\d+)\s*(?:minutes?|mins?)\b', flags=re.I)
+
+
+def _clock(hour: int, minute: int, meridiem) -> str | None:
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem.lower() == 'pm' else 0)
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        return None
+    return f"{hour:02d}:{minute:02d}"
+
+
+def parse_slot_params(text: str) -> dict:
+    """
+    Extract find_free_slots_for_date() parameters from conversational text.
+    Only keys that were actually mentioned are returned, so defaults still apply.
+
+    Examples:
+        "next monday morning"        -> {"work_start": "09:00", "work_end": "12:00"}
+        "1 hour appointments friday" -> {"slot_minutes": 60}
+        "anything after 2pm"         -> {"work_start": "14:00"}
+    """
+    params = {}
+    if not text:
+        return params
+    s = text.lower()
+
+    for part, (start, end) in PARTS_OF_DAY.items():
+        if re.search(r'\b' + part + r'\b', s):
+            params["work_start"], params["work_end"] = start, end
+            break
+
+    # Explicit bounds need am/pm or HH:MM so "after 2 days" isn't read as a time
+    for word, hour_s, min_s, meridiem in TIME_BOUND_RE.findall(s):
+        if not meridiem and not min_s:
+            continue
+        clock = _clock(int(hour_s), int(min_s or 0), meridiem)
+        if clock is None:
+            continue
+        if word in ("after", "from"):
+            params["work_start"] = clock
+        else:
+            params["work_end"] = clock
+
+    if params.get("work_start") and params.get("work_end") and params["work_start"] >= params["work_end"]:
+        params.pop("work_end")
+
+    # Slot length
+    if re.search(r'\b(?:an?|one)\s+hour\s+and\s+a\s+half\b|\b(?:1|one)\s+and\s+a\s+half\s+hours?\b', s):
+        params["slot_minutes"] = 90
+    elif re.search(r'\bhalf\s+(?:an\s+)?hour\b', s):
+        params["slot_minutes"] = 30
+    elif re.search(r'\b(?:an|one)\s+hour\b', s):
+        params["slot_minutes"] = 60
+    else:
+        m = HOURS_RE.search(s)
+        if m:
+            params["slot_minutes"] = int(float(m.group(1)) * 60)
+        else:
+            m = MINUTES_RE.search(s)
+            if m:
+                params["slot_minutes"] = int(m.group(1))
+    if params.get("slot_minutes", 1) <= 0:
+        params.pop("slot_minutes")
+
+    return params
+
 # assume today is 2025-11-20 (base)
 base = get_current_date()
 
@@ -1,5 +1,7 @@
 import streamlit as st
-from Booking_Agent_class import BookingAgent, OllamaLLM
+from Booking_Agent_class import BookingAgent
+import resources
+from response_templates import render_response
 
 st.set_page_config(
     page_title="MediBook Pro - Healthcare Scheduling",
@@ -364,13 +366,37 @@ st.markdown(
 )
 
 
+@st.cache_resource
+def shared_llm():
+    return resources.get_llm()
+
+
+@st.cache_resource
+def shared_booking_journal():
+    return resources.get_booking_journal()
+
+
+@st.cache_resource
+def shared_slot_holds():
+    return resources.get_slot_holds()
+
+
+@st.cache_resource
+def shared_availability_index():
+    return resources.get_availability_index()
+
+
 class BookingApp:
     def __init__(self):
-        if 'llm' not in st.session_state:
-            st.session_state.llm = OllamaLLM(model="llama3.2", temperature=0)
-
+        # The LLM client is built once per worker process and shared by all sessions;
+        # the agent fetches the shared calendar client from resources on first calendar use.
+        # Confirmed bookings go to the shared journal and reach the calendar in the background;
+        # slot lookups for the next two weeks are served from the shared availability index.
         if 'agent' not in st.session_state:
-            st.session_state.agent = BookingAgent(st.session_state.llm)
+            st.session_state.agent = BookingAgent(
+                shared_llm(), availability_index=shared_availability_index(),
+                booking_journal=shared_booking_journal(), slot_holds=shared_slot_holds()
+            )
 
     def initialize_session_state(self):
         if 'messages' not in st.session_state:
@@ -383,6 +409,8 @@ class BookingApp:
             st.session_state.conversation_active = True
         if 'last_input' not in st.session_state:
             st.session_state.last_input = ""
+        if 'failure_reported' not in st.session_state:
+            st.session_state.failure_reported = None  # booking key the patient was told failed
 
     def display_chat_messages(self):
         chat_container = st.container()
@@ -427,8 +455,14 @@ class BookingApp:
                             use_container_width=True,
                             type="primary"
                     ):
+                        if not agent.select_slot(slot_str):
+                            # Another session holds it; the slot list was refreshed without it
+                            st.session_state.messages.append({
+                                "role": "assistant",
+                                "content": render_response("slot_taken", agent.locale, slot=slot_str)
+                            })
+                            st.rerun()
                         st.session_state.selected_slot = slot_str
-                        agent.context['time_str'] = slot_str
                         st.session_state.slots_visible = False
 
                         st.session_state.messages.append({
@@ -465,6 +499,18 @@ class BookingApp:
         st.markdown("📧 **Confirmation email sent** • 📱 **Calendar invite added**")
         st.markdown('</div>', unsafe_allow_html=True)
 
+    def report_failed_booking(self):
+        """Tell the patient once if the journal gave up writing this session's latest booking."""
+        agent = st.session_state.agent
+        if agent.last_booking_key is None or st.session_state.failure_reported == agent.last_booking_key:
+            return
+        if agent.booking_status() == 'failed':
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": render_response("booking_failed", agent.locale)
+            })
+            st.session_state.failure_reported = agent.last_booking_key
+
     def display_status_indicator(self):
         agent = st.session_state.agent
 
@@ -520,19 +566,26 @@ class BookingApp:
         agent = st.session_state.agent
         st.session_state.messages.append({"role": "user", "content": user_input})
 
-        with st.spinner("🤔 Processing your request..."):
-            response = agent.process_user_input(user_input)
-            if response:
-                st.session_state.messages.append({"role": "assistant", "content": response})
-
-            if agent.state == 'slots_found' and agent.available_slots and not st.session_state.selected_slot:
-                st.session_state.slots_visible = True
-            else:
-                st.session_state.slots_visible = False
+        # Render the reply as it streams in, so the patient waits for the first token only
+        placeholder = st.empty()
+        placeholder.markdown('<div class="assistant-message">🤔 Processing your request...</div>', unsafe_allow_html=True)
+        response = ""
+        for chunk in agent.process_user_input_stream(user_input):
+            response += chunk
+            placeholder.markdown(f'<div class="assistant-message">{response}</div>', unsafe_allow_html=True)
+        placeholder.empty()
+
+        if response:
+            st.session_state.messages.append({"role": "assistant", "content": response})
+
+        if agent.state == 'slots_found' and agent.available_slots and not st.session_state.selected_slot:
+            st.session_state.slots_visible = True
+        else:
+            st.session_state.slots_visible = False
 
-            if agent.state == 'completed':
-                time_str = agent.context.get('time_str', st.session_state.selected_slot)
-                self.show_booking_confirmation(time_str)
+        if agent.state == 'completed':
+            time_str = agent.context.get('time_str', st.session_state.selected_slot)
+            self.show_booking_confirmation(time_str)
 
     def render_sidebar(self):
         with st.sidebar:
@@ -584,6 +637,8 @@ class BookingApp:
     def render(self):
         self.initialize_session_state()
         agent = st.session_state.agent
+        # Journalled bookings are written in the background; check on this session's latest one every turn
+        self.report_failed_booking()
 
         # Header Section
         st.markdown('<div class="main-header">🏥 MediBook Pro</div>', unsafe_allow_html=True)
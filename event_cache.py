@@ -0,0 +1,205 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+from calendar_functions import TIMEZONE, _http_status, _execute, add_write_listener, remove_write_listener
+from single_flight import SingleFlight
+
+
+class EventCache:
+    """
+    Local SQLite copy of calendar events, kept current with Calendar syncToken
+    incremental sync.
+
+    The first sync() for a calendar downloads every event; later calls only pull
+    the changes since the stored syncToken. If Google answers 410 (token
+    invalidated) the calendar is wiped and fully re-synced. A booking written
+    through calendar_functions makes the next sync() of its calendar pull the
+    delta at once instead of trusting the local copy for min_sync_interval.
+
+    Changes are pulled from Google outside the lock, so reads never wait on a
+    slow sync, and concurrent sync() calls for one calendar share one pull.
+
+    Usage:
+        cache = EventCache("event_cache.sqlite3")
+        events = get_events_for_date(service, "2025-11-26", cache=cache)
+    """
+
+    def __init__(self, path: str = "event_cache.sqlite3", min_sync_interval: float = 30.0):
+        """
+        Args:
+            path: SQLite file to store events in (':memory:' for a throwaway cache).
+            min_sync_interval: seconds to trust local data before pulling deltas again.
+        """
+        self.min_sync_interval = min_sync_interval
+        self.tz = pytz.timezone(TIMEZONE)
+        self._lock = threading.Lock()
+        self._generations = {}  # calendar_id -> bumped by invalidate()
+        self._flight = SingleFlight()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS events (
+                calendar_id TEXT NOT NULL,
+                event_id TEXT NOT NULL,
+                start_ts REAL NOT NULL,
+                end_ts REAL NOT NULL,
+                body TEXT NOT NULL,
+                PRIMARY KEY (calendar_id, event_id)
+            );
+            CREATE INDEX IF NOT EXISTS events_by_start ON events (calendar_id, start_ts);
+            CREATE TABLE IF NOT EXISTS sync_state (
+                calendar_id TEXT PRIMARY KEY,
+                sync_token TEXT,
+                synced_at REAL
+            );
+            """
+        )
+        self._conn.commit()
+
+        add_write_listener(self.invalidate)
+
+    def close(self):
+        remove_write_listener(self.invalidate)
+        self._conn.close()
+
+    def invalidate(self, calendar_id: str, date_str: str = None):
+        """Write listener: the next sync() of calendar_id pulls changes even if the last one is recent."""
+        with self._lock:
+            self._generations[calendar_id] = self._generations.get(calendar_id, 0) + 1
+            self._conn.execute("UPDATE sync_state SET synced_at = NULL WHERE calendar_id = ?", (calendar_id,))
+            self._conn.commit()
+
+    def has_synced(self, calendar_id: str):
+        """True once calendar_id has a local copy to answer from."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM sync_state WHERE calendar_id = ?", (calendar_id,)
+            ).fetchone() is not None
+
+    def sync(self, service, calendar_id: str, force: bool = False):
+        """
+        Bring the local copy of `calendar_id` up to date.
+
+        Args:
+            service: Google Calendar API service object.
+            calendar_id: calendar to sync.
+            force: pull from Google even if the last sync is recent.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sync_token, synced_at FROM sync_state WHERE calendar_id = ?",
+                (calendar_id,),
+            ).fetchone()
+        sync_token, synced_at = row if row else (None, None)
+        if not force and synced_at and time.time() - synced_at < self.min_sync_interval:
+            return
+        self._flight.do(calendar_id, self._sync, service, calendar_id)
+
+    def _sync(self, service, calendar_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sync_token FROM sync_state WHERE calendar_id = ?", (calendar_id,)
+            ).fetchone()
+            sync_token = row[0] if row else None
+            generation = self._generations.get(calendar_id, 0)
+
+        if sync_token:
+            try:
+                events, next_token = self._pull(service, calendar_id, sync_token)
+                self._apply(calendar_id, events, next_token, False, generation)
+                return
+            except Exception as e:
+                if _http_status(e) != 410:
+                    raise
+                print(f"Sync token for {calendar_id} invalidated, doing a full resync")
+
+        events, next_token = self._pull(service, calendar_id, None)
+        self._apply(calendar_id, events, next_token, True, generation)
+
+    def events_for_date(self, calendar_id: str, date_str: str):
+        """
+        Return the cached events overlapping a date, ordered by start time.
+
+        Args:
+            calendar_id: calendar ID.
+            date_str: 'YYYY-MM-DD' string.
+
+        Returns:
+            List of event dicts, in the same shape events().list returns.
+        """
+        date = datetime.strptime(date_str, "%Y-%m-%d").date()
+        day_start = self.tz.localize(datetime.combine(date, datetime.min.time()))
+        day_end = day_start + timedelta(days=1)
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT body FROM events WHERE calendar_id = ? AND start_ts < ? AND end_ts > ? "
+                "ORDER BY start_ts",
+                (calendar_id, day_end.timestamp(), day_start.timestamp()),
+            ).fetchall()
+        return [json.loads(body) for (body,) in rows]
+
+    def _pull(self, service, calendar_id: str, sync_token):
+        """Page through events().list, returning (events, nextSyncToken)."""
+        events = []
+        page_token = None
+        while True:
+            params = {"calendarId": calendar_id, "singleEvents": True}
+            if sync_token:
+                params["syncToken"] = sync_token
+            if page_token:
+                params["pageToken"] = page_token
+
+            result = _execute(service.events().list(**params))
+            events.extend(result.get('items', []))
+
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                return events, result.get('nextSyncToken')
+
+    def _apply(self, calendar_id: str, events, next_token, full: bool, generation: int):
+        with self._lock:
+            if full:
+                self._conn.execute("DELETE FROM events WHERE calendar_id = ?", (calendar_id,))
+            for event in events:
+                if event.get('status') == 'cancelled':
+                    self._conn.execute(
+                        "DELETE FROM events WHERE calendar_id = ? AND event_id = ?",
+                        (calendar_id, event['id']),
+                    )
+                else:
+                    self._upsert(calendar_id, event)
+            # a write reported during the pull may be missing from it: keep the next sync() due
+            fresh = self._generations.get(calendar_id, 0) == generation
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (calendar_id, sync_token, synced_at) VALUES (?, ?, ?)",
+                (calendar_id, next_token, time.time() if fresh else None),
+            )
+            self._conn.commit()
+
+    def _upsert(self, calendar_id: str, event: dict):
+        start_ts = self._timestamp(event.get("start", {}))
+        end_ts = self._timestamp(event.get("end", {}))
+        if start_ts is None or end_ts is None:
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO events (calendar_id, event_id, start_ts, end_ts, body) VALUES (?, ?, ?, ?, ?)",
+            (calendar_id, event['id'], start_ts, end_ts, json.dumps(event)),
+        )
+
+    def _timestamp(self, when: dict):
+        """Epoch seconds for an event start/end; all-day dates use midnight in TIMEZONE."""
+        if "dateTime" in when:
+            dt = datetime.fromisoformat(when["dateTime"].replace("Z", "+00:00"))
+            if dt.tzinfo is None:
+                dt = self.tz.localize(dt)
+            return dt.timestamp()
+        if "date" in when:
+            date = datetime.strptime(when["date"], "%Y-%m-%d").date()
+            return self.tz.localize(datetime.combine(date, datetime.min.time())).timestamp()
+        return None
@@ -0,0 +1,147 @@
+"""
+Export free appointment slots for a set of calendars and a date range.
+
+    python export_availability.py --calendar primary --start 2025-01-01 --end 2025-12-31 -o slots.csv
+    python export_availability.py --calendar dr-a@clinic --calendar dr-b@clinic \
+        --start 2025-01-01 --end 2025-03-31 --format parquet -o slots.parquet
+
+The range is fetched in chunks of --chunk-days with one FreeBusy query per chunk,
+and each chunk's rows are written before the next is fetched, so memory stays
+flat however long the range is. Each day's slots are computed exactly as the
+chat agent offers them (calendar_functions + slot_engine.day_slot_list).
+"""
+import argparse
+import csv
+import sys
+from datetime import datetime, timedelta
+
+import pytz
+
+from calendar_functions import (
+    TIMEZONE,
+    DEFAULT_CALENDAR_ID,
+    _busy_to_events,
+    _events_to_appointments,
+    _working_hours,
+)
+from bulk_availability import fetch_busy_window
+from slot_engine import day_slot_list
+
+COLUMNS = ["calendar_id", "date", "start", "end"]
+
+
+def iter_free_slots(service, calendar_ids, start_date, end_date, work_start="09:00", work_end="18:00",
+                    slot_minutes=30, chunk_days=7):
+    """
+    Yield lists of (calendar_id, date, start 'HH:MM', end 'HH:MM') rows, one list per chunk.
+
+    Args:
+        service: Google Calendar service.
+        calendar_ids: calendars to export.
+        start_date, end_date: datetime.date bounds, both inclusive.
+        work_start, work_end: daily working window 'HH:MM'.
+        slot_minutes: slot length.
+        chunk_days: days fetched per FreeBusy query.
+    """
+    tz = pytz.timezone(TIMEZONE)
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        days = min(chunk_days, (end_date - chunk_start).days + 1)
+        busy = fetch_busy_window(service, calendar_ids, chunk_start.strftime("%Y-%m-%d"), days)
+        rows = []
+        for calendar_id in calendar_ids:
+            events = _busy_to_events(busy[calendar_id])
+            for offset in range(days):
+                day = chunk_start + timedelta(days=offset)
+                date_str = day.strftime("%Y-%m-%d")
+                hours = _working_hours(tz, day, work_start, work_end)
+                appointments = _events_to_appointments(events, tz, hours[0], hours[1])
+                rows.extend((calendar_id, date_str, start, end)
+                            for start, end in day_slot_list(tz, hours, appointments, slot_minutes))
+        yield rows
+        chunk_start += timedelta(days=days)
+
+
+class CsvSink:
+    def __init__(self, path):
+        self._file = sys.stdout if path == "-" else open(path, "w", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(COLUMNS)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def close(self):
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+class ParquetSink:
+    """Writes each chunk as its own row group."""
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet export needs pyarrow: pip install pyarrow")
+        self._pa = pa
+        self._schema = pa.schema([(name, pa.string()) for name in COLUMNS])
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, rows):
+        if not rows:
+            return
+        columns = list(zip(*rows))
+        self._writer.write_table(self._pa.Table.from_arrays(
+            [self._pa.array(column, type=self._pa.string()) for column in columns], schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description="Export free appointment slots to CSV or Parquet.")
+    parser.add_argument("--calendar", action="append", dest="calendars",
+                        help=f"calendar ID to export; repeat for several (default: {DEFAULT_CALENDAR_ID})")
+    parser.add_argument("--start", required=True, help="first date, YYYY-MM-DD")
+    parser.add_argument("--end", required=True, help="last date (inclusive), YYYY-MM-DD")
+    parser.add_argument("-o", "--output", default="-", help="output file, '-' for stdout (CSV only)")
+    parser.add_argument("--format", choices=["csv", "parquet"],
+                        help="output format (default: from the output file extension, else csv)")
+    parser.add_argument("--work-start", default="09:00")
+    parser.add_argument("--work-end", default="18:00")
+    parser.add_argument("--slot-minutes", type=int, default=30)
+    parser.add_argument("--chunk-days", type=int, default=7, help="days fetched per FreeBusy query")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    start_date = datetime.strptime(args.start, "%Y-%m-%d").date()
+    end_date = datetime.strptime(args.end, "%Y-%m-%d").date()
+    if end_date < start_date:
+        raise SystemExit("--end must not be before --start")
+
+    fmt = args.format or ("parquet" if args.output.endswith(".parquet") else "csv")
+    if fmt == "parquet" and args.output == "-":
+        raise SystemExit("Parquet output needs a file path")
+
+    from resources import get_calendar_service
+    service = get_calendar_service()
+
+    sink = ParquetSink(args.output) if fmt == "parquet" else CsvSink(args.output)
+    total = 0
+    try:
+        for rows in iter_free_slots(service, args.calendars or [DEFAULT_CALENDAR_ID], start_date, end_date,
+                                    args.work_start, args.work_end, args.slot_minutes, args.chunk_days):
+            sink.write(rows)
+            total += len(rows)
+    finally:
+        sink.close()
+    print(f"Exported {total} free slots", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
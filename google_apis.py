@@ -1,38 +1,241 @@
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
 import os
+import threading
+from datetime import datetime
+
+# Google client libraries are imported inside the functions that use them, so
+# importing this module (and everything that imports it) stays cheap and works
+# without them installed.
+
+
+class _HttpPool:
+    """
+    AuthorizedHttp objects shared by every thread, for HttpRequest's `http`.
+
+    httplib2.Http is not thread-safe, so each request checks one out for just
+    the duration of the call and hands it back. Idle ones keep their connection
+    to Google alive for the next request, whichever thread makes it; Streamlit
+    runs every rerun on a new thread, so per-thread clients would never be reused.
+    """
+
+    def __init__(self, creds, max_idle=8):
+        self.credentials = creds  # read by googleapiclient when refreshing a batch's token
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _checkout(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()  # most recently used: its connection is the likeliest to be open
+        import google_auth_httplib2
+        from googleapiclient.http import build_http
+
+        # build_http(): the client's default socket timeout and redirect handling
+        return google_auth_httplib2.AuthorizedHttp(self.credentials, http=build_http())
+
+    def _checkin(self, http):
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(http)
+                return
+        http.close()
+
+    def request(self, *args, **kwargs):
+        http = self._checkout()
+        try:
+            return http.request(*args, **kwargs)
+        finally:
+            self._checkin(http)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for http in idle:
+            http.close()
+
+
+def _pooled_request_builder(creds):
+    """requestBuilder for build() whose requests all draw on one _HttpPool."""
+    from googleapiclient.http import HttpRequest
+
+    pool = _HttpPool(creds)
+
+    def build_request(http, *args, **kwargs):
+        return HttpRequest(pool, *args, **kwargs)
+
+    return build_request
+
+
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+TOKEN_DIR = "token_files"
+DISCOVERY_CACHE_DIR = "discovery_cache"
+DISCOVERY_URL = "https://www.googleapis.com/discovery/v1/apis/{api}/{version}/rest"
+
+_discovery_docs = {}  # (service_name, version) -> discovery document JSON, per process
+_credential_managers = {}  # api_name -> running CredentialManager
+
+
+def token_path(api_name):
+    return os.path.join(os.getcwd(), TOKEN_DIR, f"{TOKEN_DIR}_{api_name}.json")
+
+
+def write_token(token_file, data):
+    """Write a token file atomically, so a crash never leaves half a token behind."""
+    tmp_file = f"{token_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_file, 'w') as token:
+        token.write(data)
+    os.replace(tmp_file, token_file)
+
+
+class CredentialManager:
+    """
+    Refreshes OAuth credentials in a background thread before they expire.
+
+    Every service built from `creds` shares the same credentials object, so a
+    refresh here hands the new token to all worker threads at once. Because the
+    token is replaced well ahead of expiry, requests never find it expired and
+    never block on a refresh round trip themselves.
+    """
+
+    def __init__(self, creds, token_file, refresh_margin=600, retry_interval=30):
+        """
+        Args:
+            creds: google.oauth2.credentials.Credentials shared by the services.
+            token_file: where the refreshed token is saved.
+            refresh_margin: seconds before expiry to refresh; must exceed
+                google-auth's own refresh threshold (a few minutes).
+            retry_interval: seconds to wait after a failed refresh.
+        """
+        self.creds = creds
+        self.token_file = token_file
+        self.refresh_margin = refresh_margin
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="credential-refresh", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def refresh(self):
+        """Refresh now and persist the new token."""
+        from google.auth.transport.requests import Request
+
+        with self._lock:
+            self.creds.refresh(Request())
+            write_token(self.token_file, self.creds.to_json())
+
+    def seconds_until_refresh(self):
+        expiry = self.creds.expiry  # naive UTC, as google-auth stores it
+        if expiry is None:
+            return self.refresh_margin
+        remaining = (expiry - datetime.utcnow()).total_seconds()
+        return max(0.0, remaining - self.refresh_margin)
+
+    def _run(self):
+        while not self._stop.wait(self.seconds_until_refresh()):
+            try:
+                self.refresh()
+                print("OAuth token refreshed in background")
+            except Exception as e:
+                print(f"Background token refresh failed: {e}")
+                self._stop.wait(self.retry_interval)
+
+
+def load_credentials(client_secret, api_name, scopes=SCOPES):
+    """
+    Load the stored OAuth token for `api_name`, refreshing it or running the
+    browser flow if needed, and save it back to token_files/.
+    """
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
 
-def create_service(client_secret, api_name, service_name):
-    CLIENT_SECRET = client_secret
-    SCOPES = ['https://www.googleapis.com/auth/calendar']
     creds = None
-    API_NAME = api_name
-    cur_dir = os.getcwd()
-    token_dir = "token_files"
-    token_file = f"{token_dir}_{API_NAME}.json"
-    if not os.path.exists(os.path.join(cur_dir, token_dir)):
-        os.mkdir(os.path.join(cur_dir, token_dir))
-    if os.path.exists(os.path.join(cur_dir, token_dir, token_file)):
-        creds = Credentials.from_authorized_user_file(os.path.join(cur_dir, token_dir, token_file), SCOPES)
+    token_file = token_path(api_name)
+    os.makedirs(os.path.dirname(token_file), exist_ok=True)
+    if os.path.exists(token_file):
+        creds = Credentials.from_authorized_user_file(token_file, scopes)
 
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
             creds.refresh(Request())
 
         else:
-            flow = InstalledAppFlow.from_client_secrets_file(client_secret, SCOPES)
+            flow = InstalledAppFlow.from_client_secrets_file(client_secret, scopes)
             creds = flow.run_local_server(port=0)
 
-        with open(os.path.join(cur_dir, token_dir, token_file), 'w') as token:
-            token.write(creds.to_json())
+        write_token(token_file, creds.to_json())
+    return creds
+
+
+def load_discovery_document(service_name, version='v3'):
+    """
+    Return the discovery document for an API without a network round trip when possible.
+
+    Looked up in order: this process, discovery_cache/ on disk, the static copy
+    bundled with google-api-python-client, and only then the discovery service.
+    Whatever is found is written to discovery_cache/ for the next worker.
+    """
+    key = (service_name, version)
+    if key in _discovery_docs:
+        return _discovery_docs[key]
+
+    cache_file = os.path.join(os.getcwd(), DISCOVERY_CACHE_DIR, f"{service_name}.{version}.json")
+    if os.path.exists(cache_file):
+        with open(cache_file) as f:
+            doc = f.read()
+    else:
+        from googleapiclient.discovery_cache import get_static_doc
+
+        doc = get_static_doc(service_name, version)
+        if doc is None:
+            from googleapiclient.http import build_http
+
+            resp, content = build_http().request(DISCOVERY_URL.format(api=service_name, version=version))
+            if resp.status != 200:
+                raise RuntimeError(f"Could not fetch discovery document for {service_name} {version}: HTTP {resp.status}")
+            doc = content.decode('utf-8')
+
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w') as f:
+            f.write(doc)
+        os.replace(tmp_file, cache_file)
+
+    _discovery_docs[key] = doc
+    return doc
+
+
+def build_service(service_name, creds, version='v3'):
+    """Build an API client from the cached discovery document; no discovery fetch."""
+    from googleapiclient.discovery import build_from_document
+
+    doc = load_discovery_document(service_name, version)
+    return build_from_document(doc, credentials=creds,
+                               requestBuilder=_pooled_request_builder(creds))
+
+
+def create_service(client_secret, api_name, service_name, refresh_in_background=True):
+    creds = load_credentials(client_secret, api_name)
     try:
-        service = build(service_name, 'v3', credentials=creds)
+        service = build_service(service_name, creds)
         print(service_name, "successfully created")
+        if refresh_in_background and api_name not in _credential_managers:
+            _credential_managers[api_name] = CredentialManager(creds, token_path(api_name)).start()
         return service
     except Exception as e:
         print(e)
         print("Failed to create the service")
-        os.remove(os.path.join(cur_dir, token_dir, token_file))
-        return None
\ No newline at end of file
+        os.remove(token_path(api_name))
+        return None
@@ -0,0 +1,247 @@
+"""
+Bulk-import existing appointments into a calendar.
+
+    python import_appointments.py appointments.csv --report import_report.csv
+
+Input is CSV (with a header row) or JSONL (one object per line, chosen by the
+.jsonl extension) with the fields:
+
+    patient_name, date (YYYY-MM-DD), time (HH:MM or HH:MM-HH:MM), description,
+    calendar_id (optional), duration_minutes (optional, default 30)
+
+Inserts are sent in Google batch requests of --batch-size events. Every row gets
+a line in the report (ok + event ID, or error). After each batch the number of
+rows done is saved to the checkpoint file, so re-running the same command after
+a crash continues where it stopped instead of inserting everything again. Event
+IDs are booking keys, so rows that did land before a crash are reported as
+"exists" rather than duplicated.
+
+Rate-limited and 5xx inserts are retried; if one still fails, the run stops
+with the checkpoint just before that row, so the next run picks it up again.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from api_guard import CircuitOpenError, is_transient
+from calendar_functions import DEFAULT_CALENDAR_ID, _appointment_event_body, _notify_write, _http_status, _execute, _guard, booking_key
+
+BATCH_SIZE = 50  # Calendar API advises keeping batches small; the hard limit is 1000
+REPORT_COLUMNS = ["row", "patient_name", "date", "time", "status", "event_id", "error"]
+INVALID = "_invalid"  # key of the row read_rows() yields for an unparseable line
+
+
+def read_rows(path):
+    """
+    Yield appointment dicts from a CSV or JSONL file.
+
+    A JSONL line that isn't a JSON object yields {INVALID: reason}, so it is
+    reported as an invalid row instead of ending the import.
+    """
+    with open(path, newline="") as f:
+        if path.endswith(".jsonl"):
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    row = {INVALID: f"line {line_no} is not valid JSON ({e.msg})"}
+                if not isinstance(row, dict):
+                    row = {INVALID: f"line {line_no} is not a JSON object"}
+                yield row
+        else:
+            yield from csv.DictReader(f)
+
+
+def _text(row, field, default=""):
+    """row[field] as a stripped string; numbers are converted, other JSON types are invalid."""
+    value = row.get(field)
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValueError(f"{field} must be text, not {type(value).__name__}")
+    return str(value).strip()
+
+
+def _appointment(row):
+    """(calendar_id, date_str, event body) for an input row; raises ValueError on bad rows."""
+    if INVALID in row:
+        raise ValueError(row[INVALID])
+    for field in ("patient_name", "date", "time"):
+        if field not in row:
+            raise ValueError(f"missing field {field!r}")
+    patient_name = _text(row, "patient_name")
+    date_str = _text(row, "date")
+    time_str = _text(row, "time")
+    if not (patient_name and date_str and time_str):
+        raise ValueError("empty patient_name, date or time")
+    start_str = time_str.split("-")[0].strip()
+    duration = int(_text(row, "duration_minutes") or 30)
+    if "-" in time_str and not _text(row, "duration_minutes"):
+        start_h, start_m = map(int, start_str.split(":"))
+        end_h, end_m = map(int, time_str.split("-")[1].strip().split(":"))
+        duration = (end_h * 60 + end_m) - (start_h * 60 + start_m)
+    calendar_id = _text(row, "calendar_id") or DEFAULT_CALENDAR_ID
+    event_id = booking_key(calendar_id, patient_name, date_str, start_str)
+    body = _appointment_event_body(patient_name, date_str, start_str, _text(row, "description"), duration, event_id)
+    return calendar_id, date_str, body
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        return json.load(f)["next_row"]
+
+
+def save_checkpoint(path, next_row):
+    """Atomic write, so a crash leaves either the old or the new checkpoint."""
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump({"next_row": next_row}, f)
+    os.replace(tmp_file, path)
+
+
+def _insert_batch(service, requests):
+    """
+    Insert (row_no, calendar_id, body) events; returns {row_no: (event, error)}.
+
+    Uses one BatchHttpRequest when the service supports it, otherwise one
+    insert per event. A batch is charged one rate-limit token per event, and
+    events the batch answers with a rate-limit or 5xx error are sent again in a
+    smaller batch after a backoff.
+    """
+    results = {}
+    if not hasattr(service, "new_batch_http_request"):
+        for row_no, calendar_id, body in requests:
+            try:
+                results[row_no] = (_execute(service.events().insert(calendarId=calendar_id, body=body)), None)
+            except Exception as e:
+                results[row_no] = (None, e)
+        return results
+
+    def callback(request_id, response, exception):
+        results[int(request_id)] = (response, exception)
+
+    for attempt in range(_guard.max_retries + 1):
+        if attempt:
+            time.sleep(_guard.backoff_delay(attempt - 1))
+        batch = service.new_batch_http_request(callback=callback)
+        for row_no, calendar_id, body in requests:
+            batch.add(service.events().insert(calendarId=calendar_id, body=body), request_id=str(row_no))
+        _execute(batch, cost=len(requests))
+        requests = [request for request in requests if is_transient(results[request[0]][1])]
+        if not requests:
+            break
+    return results
+
+
+def _retry_later(error):
+    return is_transient(error) or isinstance(error, CircuitOpenError)
+
+
+def import_appointments(service, rows, report_path, checkpoint_path, batch_size=BATCH_SIZE):
+    """
+    Insert appointments in batches, writing a per-row report and a resume checkpoint.
+
+    Args:
+        service: Google Calendar service (or anything with the same events()/batch interface).
+        rows: iterable of appointment dicts, in file order.
+        report_path: CSV report; appended to when resuming.
+        checkpoint_path: JSON file holding the number of rows already done.
+        batch_size: events per batch request.
+
+    Returns:
+        (ok, failed) counts for this run.
+    """
+    start_row = load_checkpoint(checkpoint_path)
+    resuming = start_row > 0 and os.path.exists(report_path)
+    ok = failed = 0
+
+    with open(report_path, "a" if resuming else "w", newline="") as report_file:
+        report = csv.writer(report_file)
+        if not resuming:
+            report.writerow(REPORT_COLUMNS)
+
+        def write(row_no, row, status, event_id="", error=""):
+            report.writerow([row_no, row.get("patient_name"), row.get("date"), row.get("time"),
+                             status, event_id, error])
+
+        def flush(pending, next_row):
+            nonlocal ok, failed
+            requests = [(row_no, calendar_id, body) for row_no, _, calendar_id, _, body, invalid in pending
+                        if invalid is None]
+            results = _insert_batch(service, requests) if requests else {}
+            # still rate-limited / 5xx after the retries: stop before that row, so the next run retries it
+            stuck = next((row_no for row_no, *_ in pending if _retry_later(results.get(row_no, (None, None))[1])),
+                         None)
+            for row_no, row, calendar_id, date_str, body, invalid in pending:
+                if row_no == stuck:
+                    break
+                event, error = results.get(row_no, (None, None))
+                if invalid is not None:
+                    # invalid rows are reported, never sent
+                    failed += 1
+                    write(row_no, row, "error", error=f"invalid row: {invalid}")
+                elif error is None and event is not None:
+                    ok += 1
+                    _notify_write(calendar_id, date_str)
+                    write(row_no, row, "ok", event.get("id", ""))
+                elif _http_status(error) == 409:
+                    # same booking key already in the calendar, e.g. imported by an earlier run
+                    ok += 1
+                    write(row_no, row, "exists", body["id"])
+                else:
+                    failed += 1
+                    write(row_no, row, "error", error=str(error or "no response"))
+            report_file.flush()
+            save_checkpoint(checkpoint_path, next_row if stuck is None else stuck - 1)
+            if stuck is not None:
+                raise RuntimeError(f"Row {stuck} still failing after retries ({results[stuck][1]});"
+                                   f" re-run to resume from it")
+
+        pending = []
+        last_row = start_row
+        for row_no, row in enumerate(rows, start=1):
+            if row_no <= start_row:
+                continue
+            last_row = row_no
+            try:
+                calendar_id, date_str, body = _appointment(row)
+                pending.append((row_no, row, calendar_id, date_str, body, None))
+            except ValueError as e:
+                pending.append((row_no, row, None, None, None, e))
+            if len(pending) >= batch_size:
+                flush(pending, row_no)
+                pending = []
+        flush(pending, last_row)
+
+    return ok, failed
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description="Bulk-import appointments into Google Calendar.")
+    parser.add_argument("source", help="CSV or JSONL file of appointments")
+    parser.add_argument("--report", default="import_report.csv", help="per-row result CSV")
+    parser.add_argument("--checkpoint", help="resume checkpoint (default: <source>.checkpoint.json)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    checkpoint = args.checkpoint or f"{args.source}.checkpoint.json"
+
+    from resources import get_calendar_service
+    service = get_calendar_service()
+
+    ok, failed = import_appointments(service, read_rows(args.source), args.report, checkpoint, args.batch_size)
+    print(f"Imported {ok} appointments, {failed} failed (see {args.report})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+import json
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import unquote
+
+import pytz
+
+from calendar_functions import TIMEZONE, DEFAULT_CALENDAR_ID
+
+PAGE_SIZE = 250  # events().list default maxResults
+EVENTS_PATH_RE = re.compile(r"/calendars/([^/]+)/events(?:/([^/]+))?$")
+
+
+class LocalHttpError(Exception):
+    """Error shaped like googleapiclient's HttpError: .resp.status, .content, .reason."""
+
+    class _Resp:
+        def __init__(self, status):
+            self.status = status
+
+    def __init__(self, status: int, reason: str):
+        super().__init__(f"{status} {reason}")
+        self.resp = self._Resp(status)
+        self.reason = reason
+        self.content = json.dumps({"error": {"code": status, "message": reason}}).encode()
+
+
+class LocalRequest:
+    """Deferred call, like googleapiclient's HttpRequest: nothing runs until execute()."""
+
+    quota_free = True  # no API quota behind it; api_guard skips the token bucket
+
+    def __init__(self, fn, *args):
+        self._fn = fn
+        self._args = args
+
+    def execute(self):
+        return self._fn(*self._args)
+
+
+class LocalBatch:
+    """new_batch_http_request() equivalent; requests run in order on execute()."""
+
+    def __init__(self, callback=None):
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self._requests.append((request, callback or self._callback, request_id or str(len(self._requests) + 1)))
+
+    def execute(self):
+        for request, callback, request_id in self._requests:
+            try:
+                response, exception = request.execute(), None
+            except LocalHttpError as e:
+                response, exception = None, e
+            if callback is not None:
+                callback(request_id, response, exception)
+
+
+def _timestamp(when: dict, tz):
+    """Epoch seconds for an event start/end; all-day dates use midnight in TIMEZONE."""
+    if "dateTime" in when:
+        dt = datetime.fromisoformat(when["dateTime"].replace("Z", "+00:00"))
+        if dt.tzinfo is None:
+            dt = tz.localize(dt)
+        return dt.timestamp()
+    if "date" in when:
+        date = datetime.strptime(when["date"], "%Y-%m-%d").date()
+        return tz.localize(datetime.combine(date, datetime.min.time())).timestamp()
+    raise LocalHttpError(400, "Missing start or end time")
+
+
+def _rfc3339(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class _Events:
+    def __init__(self, store):
+        self._store = store
+
+    def list(self, calendarId, timeMin=None, timeMax=None, syncToken=None, pageToken=None,
+             maxResults=PAGE_SIZE, showDeleted=False, **_):
+        return LocalRequest(self._store.list_events, calendarId, timeMin, timeMax, syncToken, pageToken,
+                            maxResults, showDeleted)
+
+    def insert(self, calendarId, body, **_):
+        return LocalRequest(self._store.insert_event, calendarId, body)
+
+    def get(self, calendarId, eventId, **_):
+        return LocalRequest(self._store.get_event, calendarId, eventId)
+
+    def update(self, calendarId, eventId, body, **_):
+        return LocalRequest(self._store.update_event, calendarId, eventId, body)
+
+    def delete(self, calendarId, eventId, **_):
+        return LocalRequest(self._store.delete_event, calendarId, eventId)
+
+
+class _FreeBusy:
+    def __init__(self, store):
+        self._store = store
+
+    def query(self, body):
+        return LocalRequest(self._store.query_freebusy, body)
+
+
+class _CalendarList:
+    def __init__(self, store):
+        self._store = store
+
+    def list(self, **_):
+        return LocalRequest(self._store.list_calendars)
+
+
+class LocalCalendarService:
+    """
+    Calendar backend on SQLite, with the googleapiclient service interface.
+
+    Supports what this project calls: events().list (time window, paging,
+    syncToken incremental sync with 410 for unknown tokens), insert (409 on a
+    duplicate event ID), get, update and delete, freebusy().query,
+    calendarList().list and new_batch_http_request. Errors carry .resp.status
+    like HttpError, so calendar_functions handles them unchanged.
+
+    Use ':memory:' for tests and load tests, or a file to run a clinic fully
+    offline; several processes can share one file. Calendars are created on
+    first insert; 'primary' always exists.
+
+    Usage:
+        service = LocalCalendarService("local_calendar.sqlite3")
+        find_free_slots_for_date(service, "2025-11-26")
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.tz = pytz.timezone(TIMEZONE)
+        self._lock = threading.Lock()
+        # autocommit mode, so writes can take the database lock with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS calendars (
+                calendar_id TEXT PRIMARY KEY
+            );
+            CREATE TABLE IF NOT EXISTS events (
+                calendar_id TEXT NOT NULL,
+                event_id TEXT NOT NULL,
+                start_ts REAL NOT NULL,
+                end_ts REAL NOT NULL,
+                status TEXT NOT NULL,
+                seq INTEGER NOT NULL,  -- change counter; sync tokens are seq values
+                body TEXT NOT NULL,
+                PRIMARY KEY (calendar_id, event_id)
+            );
+            CREATE INDEX IF NOT EXISTS events_by_start ON events (calendar_id, start_ts);
+            CREATE INDEX IF NOT EXISTS events_by_seq ON events (calendar_id, seq);
+            CREATE INDEX IF NOT EXISTS events_seq ON events (seq);
+            """
+        )
+        self._conn.execute("INSERT OR IGNORE INTO calendars VALUES (?)", (DEFAULT_CALENDAR_ID,))
+
+    # googleapiclient-style resources
+
+    def events(self):
+        return _Events(self)
+
+    def freebusy(self):
+        return _FreeBusy(self)
+
+    def calendarList(self):
+        return _CalendarList(self)
+
+    def new_batch_http_request(self, callback=None):
+        return LocalBatch(callback)
+
+    # implementation
+
+    def _last_seq(self):
+        return self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM events").fetchone()[0]
+
+    def _change(self, fn):
+        """
+        Run fn(seq) in a write transaction with the next change number.
+
+        BEGIN IMMEDIATE takes the database write lock before seq is read, so
+        processes sharing the file never hand out the same seq.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._last_seq() + 1)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def _write(self, calendar_id, event, seq, replace=True):
+        self._conn.execute(
+            f"INSERT {'OR REPLACE ' if replace else ''}INTO events"
+            " (calendar_id, event_id, start_ts, end_ts, status, seq, body) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (calendar_id, event["id"], _timestamp(event.get("start", {}), self.tz),
+             _timestamp(event.get("end", {}), self.tz), event["status"], seq, json.dumps(event)),
+        )
+
+    def _row(self, calendar_id, event_id):
+        row = self._conn.execute(
+            "SELECT body FROM events WHERE calendar_id = ? AND event_id = ?", (calendar_id, event_id)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def insert_event(self, calendar_id, body):
+        event = dict(body)
+        event.setdefault("id", uuid.uuid4().hex)
+        event.setdefault("status", "confirmed")
+
+        def insert(seq):
+            self._conn.execute("INSERT OR IGNORE INTO calendars VALUES (?)", (calendar_id,))
+            try:
+                self._write(calendar_id, event, seq, replace=False)
+            except sqlite3.IntegrityError:
+                raise LocalHttpError(409, "The requested identifier already exists.")
+
+        self._change(insert)
+        return event
+
+    def get_event(self, calendar_id, event_id):
+        with self._lock:
+            event = self._row(calendar_id, event_id)
+        if event is None:
+            raise LocalHttpError(404, "Not Found")
+        return event
+
+    def update_event(self, calendar_id, event_id, body):
+        event = {**body, "id": event_id}
+        event.setdefault("status", "confirmed")
+
+        def update(seq):
+            if self._row(calendar_id, event_id) is None:
+                raise LocalHttpError(404, "Not Found")
+            self._write(calendar_id, event, seq)
+
+        self._change(update)
+        return event
+
+    def delete_event(self, calendar_id, event_id):
+        def delete(seq):
+            event = self._row(calendar_id, event_id)
+            if event is None or event["status"] == "cancelled":
+                raise LocalHttpError(410 if event else 404, "Resource has been deleted" if event else "Not Found")
+            # kept as cancelled, so incremental sync can report the deletion
+            self._write(calendar_id, {**event, "status": "cancelled"}, seq)
+
+        self._change(delete)
+        return ""
+
+    def list_events(self, calendar_id, time_min, time_max, sync_token, page_token, max_results, show_deleted):
+        offset = int(page_token) if page_token else 0
+        since = None
+        if sync_token is not None:
+            if time_min or time_max:
+                raise LocalHttpError(400, "syncToken cannot be combined with timeMin/timeMax")
+            try:
+                since = int(sync_token)
+            except ValueError:
+                raise LocalHttpError(410, "Sync token is no longer valid, a full sync is required.")
+            query = "SELECT body FROM events WHERE calendar_id = ? AND seq > ? ORDER BY seq"
+            params = [calendar_id, since]
+        else:
+            query = "SELECT body FROM events WHERE calendar_id = ?"
+            params = [calendar_id]
+            if not show_deleted:
+                query += " AND status != 'cancelled'"
+            if time_min:
+                query += " AND end_ts > ?"
+                params.append(_timestamp({"dateTime": time_min}, self.tz))
+            if time_max:
+                query += " AND start_ts < ?"
+                params.append(_timestamp({"dateTime": time_max}, self.tz))
+            query += " ORDER BY start_ts, event_id"
+
+        with self._lock:
+            # one read transaction, so the sync token matches the rows returned
+            self._conn.execute("BEGIN")
+            try:
+                seq = self._last_seq()
+                if since is not None and since > seq:
+                    raise LocalHttpError(410, "Sync token is no longer valid, a full sync is required.")
+                rows = self._conn.execute(f"{query} LIMIT ? OFFSET ?", params + [max_results + 1, offset]).fetchall()
+            finally:
+                self._conn.execute("COMMIT")
+
+        result = {"kind": "calendar#events", "items": [json.loads(body) for (body,) in rows[:max_results]]}
+        if len(rows) > max_results:
+            result["nextPageToken"] = str(offset + max_results)
+        else:
+            result["nextSyncToken"] = str(seq)
+        return result
+
+    def query_freebusy(self, body):
+        start = _timestamp({"dateTime": body["timeMin"]}, self.tz)
+        end = _timestamp({"dateTime": body["timeMax"]}, self.tz)
+        calendars = {}
+        with self._lock:
+            for item in body.get("items", []):
+                calendar_id = item["id"]
+                if not self._conn.execute("SELECT 1 FROM calendars WHERE calendar_id = ?", (calendar_id,)).fetchone():
+                    calendars[calendar_id] = {"errors": [{"domain": "global", "reason": "notFound"}], "busy": []}
+                    continue
+                rows = self._conn.execute(
+                    "SELECT start_ts, end_ts FROM events WHERE calendar_id = ? AND status != 'cancelled'"
+                    " AND start_ts < ? AND end_ts > ? ORDER BY start_ts",
+                    (calendar_id, end, start),
+                ).fetchall()
+                busy = []
+                for s, e in rows:
+                    s, e = max(s, start), min(e, end)
+                    if busy and s <= busy[-1][1]:
+                        busy[-1][1] = max(busy[-1][1], e)
+                    else:
+                        busy.append([s, e])
+                calendars[calendar_id] = {"busy": [{"start": _rfc3339(s), "end": _rfc3339(e)} for s, e in busy]}
+        return {
+            "kind": "calendar#freeBusy",
+            "timeMin": _rfc3339(start),
+            "timeMax": _rfc3339(end),
+            "calendars": calendars,
+        }
+
+    def list_calendars(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT calendar_id FROM calendars ORDER BY calendar_id").fetchall()
+        return {
+            "kind": "calendar#calendarList",
+            "items": [{"id": calendar_id, "summary": calendar_id, "primary": calendar_id == DEFAULT_CALENDAR_ID}
+                      for (calendar_id,) in rows],
+        }
+
+
+def mock_transport(service=None):
+    """
+    httpx.MockTransport serving the Calendar v3 REST routes from a LocalCalendarService.
+
+    A local fake server for async_calendar.AsyncCalendarClient: events list
+    (with paging and sync tokens), insert, get, update, delete and freeBusy.
+    Errors come back with their HTTP status and a Google-style error body.
+
+    Usage:
+        client = AsyncCalendarClient(lambda: "token", transport=mock_transport(LocalCalendarService()))
+    """
+    import httpx
+
+    service = service or LocalCalendarService()
+
+    def call(request):
+        path = request.url.raw_path.decode().split("?")[0]
+        if path.endswith("/freeBusy") and request.method == "POST":
+            return service.query_freebusy(json.loads(request.content))
+        m = EVENTS_PATH_RE.search(path)
+        if not m:
+            raise LocalHttpError(404, "Not Found")
+        calendar_id, event_id = unquote(m.group(1)), m.group(2) and unquote(m.group(2))
+        if event_id is None and request.method == "GET":
+            params = request.url.params
+            return service.list_events(
+                calendar_id, params.get("timeMin"), params.get("timeMax"), params.get("syncToken"),
+                params.get("pageToken"), int(params.get("maxResults", PAGE_SIZE)),
+                params.get("showDeleted") == "true",
+            )
+        if event_id is None and request.method == "POST":
+            return service.insert_event(calendar_id, json.loads(request.content))
+        if event_id is not None and request.method == "GET":
+            return service.get_event(calendar_id, event_id)
+        if event_id is not None and request.method == "PUT":
+            return service.update_event(calendar_id, event_id, json.loads(request.content))
+        if event_id is not None and request.method == "DELETE":
+            return service.delete_event(calendar_id, event_id)
+        raise LocalHttpError(405, "Method Not Allowed")
+
+    def handle(request):
+        try:
+            result = call(request)
+        except LocalHttpError as e:
+            return httpx.Response(e.resp.status, content=e.content, headers={"Content-Type": "application/json"})
+        if result == "":
+            return httpx.Response(204)
+        return httpx.Response(200, json=result)
+
+    return httpx.MockTransport(handle)
+
+
+if __name__ == "__main__":
+    # Load test: bookings/s through create_appointment_event and lookups/s
+    # through find_free_slots_for_date against an in-memory calendar.
+    import time
+    from datetime import timedelta
+
+    from calendar_functions import create_appointment_event, find_free_slots_for_date
+
+    service = LocalCalendarService()
+    first = datetime(2025, 1, 6)
+    bookings = [((first + timedelta(days=d)).strftime("%Y-%m-%d"), f"{9 + m // 60:02d}:{m % 60:02d}")
+                for d in range(100) for m in range(0, 9 * 60, 15)]
+
+    t0 = time.perf_counter()
+    for i, (date_str, time_str) in enumerate(bookings):
+        create_appointment_event(service, f"Patient {i}", date_str, time_str, "load test", duration_minutes=15)
+    t1 = time.perf_counter()
+    for d in range(100):
+        find_free_slots_for_date(service, (first + timedelta(days=d)).strftime("%Y-%m-%d"), max_days_ahead=0)
+    t2 = time.perf_counter()
+
+    print(f"{len(bookings)} bookings:   {len(bookings) / (t1 - t0):8.0f} /s")
+    print(f"100 slot lookups: {100 / (t2 - t1):8.0f} /s")
@@ -0,0 +1,97 @@
+import os
+import threading
+
+from calendar_functions import construct_calendar_service
+
+LLM_MODEL = "llama3.2"
+LLM_KEEP_ALIVE = "30m"  # keep the model loaded in Ollama between turns
+CLIENT_SECRET_FILE = "client_secret.json"
+# "google" (default) or "local": a SQLite calendar (local_calendar) for tests, load tests and offline use
+CALENDAR_BACKEND = os.environ.get("CALENDAR_BACKEND", "google")
+LOCAL_CALENDAR_FILE = os.environ.get("LOCAL_CALENDAR_FILE", "local_calendar.sqlite3")
+BOOKING_JOURNAL_FILE = "booking_journal.sqlite3"
+
+# One LLM client and one calendar client per worker process, shared by every
+# session. Both are safe to share: OllamaLLM talks to Ollama through a pooled,
+# keep-alive HTTP client, and the calendar service draws its connections from a
+# shared pool (see google_apis._HttpPool).
+_lock = threading.Lock()
+_llm = None
+_calendar_service = None
+_booking_journal = None
+_slot_holds = None
+_availability_index = None
+
+
+def get_llm():
+    """Process-wide OllamaLLM, created on first use."""
+    global _llm
+    if _llm is None:
+        with _lock:
+            if _llm is None:
+                from langchain_ollama import OllamaLLM
+                _llm = OllamaLLM(model=LLM_MODEL, temperature=0, keep_alive=LLM_KEEP_ALIVE)
+    return _llm
+
+
+def get_calendar_service():
+    """Process-wide calendar service for CALENDAR_BACKEND, created on first use."""
+    global _calendar_service
+    if _calendar_service is None:
+        with _lock:
+            if _calendar_service is None:
+                _calendar_service = build_calendar_service(CALENDAR_BACKEND)
+    return _calendar_service
+
+
+def build_calendar_service(backend: str = "google"):
+    """
+    Calendar service for a backend. Both expose the googleapiclient interface
+    (events(), freebusy(), calendarList(), new_batch_http_request()), so the
+    rest of the code does not know which one it talks to.
+    """
+    if backend == "google":
+        return construct_calendar_service(CLIENT_SECRET_FILE)
+    if backend == "local":
+        from local_calendar import LocalCalendarService
+        return LocalCalendarService(LOCAL_CALENDAR_FILE)
+    raise ValueError(f"Unknown calendar backend {backend!r}; use 'google' or 'local'")
+
+
+def get_booking_journal():
+    """Process-wide BookingJournal with its worker running, created on first use."""
+    global _booking_journal
+    if _booking_journal is None:
+        with _lock:
+            if _booking_journal is None:
+                from booking_journal import BookingJournal
+                _booking_journal = BookingJournal(path=BOOKING_JOURNAL_FILE, on_failed=_report_failed_booking).start()
+    return _booking_journal
+
+
+def _report_failed_booking(booking):
+    # Server log for the practice; patients only ever see their own booking's status
+    print(f"BOOKING FAILED {booking['booking_key']} ({booking['calendar_id']} {booking['date_str']}"
+          f" {booking['time_str']}): {booking['last_error']}")
+
+
+def get_slot_holds():
+    """Process-wide SlotHolds, in memory; pass a SQLiteHoldStore to share holds between processes."""
+    global _slot_holds
+    if _slot_holds is None:
+        with _lock:
+            if _slot_holds is None:
+                from slot_holds import SlotHolds
+                _slot_holds = SlotHolds()
+    return _slot_holds
+
+
+def get_availability_index():
+    """Process-wide AvailabilityIndex filling itself in the background, created on first use."""
+    global _availability_index
+    if _availability_index is None:
+        with _lock:
+            if _availability_index is None:
+                from availability_index import AvailabilityIndex
+                _availability_index = AvailabilityIndex().start()
+    return _availability_index
@@ -0,0 +1,28 @@
+DEFAULT_LOCALE = "en"
+
+# Replies for outcomes fully determined by agent state, per locale.
+# Fields in {braces} are filled in by render_response().
+RESPONSE_TEMPLATES = {
+    "en": {
+        "slots_found": "Great! I found available time slots on {date}: {slots}. Which time slot would you prefer?",
+        "no_slots": "I'm sorry, but there are no available slots on {date}. Would you like to try a different date?",
+        "ask_date": "I'd be happy to check availability for you! Which date would you like to come in? For example \"tomorrow\", \"next Monday\" or \"26/11\".",
+        "pick_slot": "Please select a time slot from the available options to proceed with booking.",
+        "ask_name_and_reason": "I need to know the patient's name and reason for visit to complete the booking. Could you please provide both?",
+        "ask_name": "To complete your booking, I need the patient's name. Could you please provide it?",
+        "slot_taken": "Sorry, {slot} was just taken by another patient. Please pick another time.",
+        "calendar_unavailable": "I can't reach the doctor's calendar right now. Please try again in a minute.",
+        "booking_failed": "Sorry, this appointment could not be saved to the doctor's calendar. Please call the practice to confirm a time.",
+        "name_not_caught": "I didn't catch the patient's name. Could you please tell me the name for the booking?",
+    },
+}
+
+
+def render_response(key: str, locale: str = DEFAULT_LOCALE, **fields) -> str:
+    """
+    Render the reply template `key` in `locale`.
+    Falls back to DEFAULT_LOCALE when the locale or the key isn't translated.
+    """
+    templates = RESPONSE_TEMPLATES.get(locale, {})
+    template = templates.get(key) or RESPONSE_TEMPLATES[DEFAULT_LOCALE][key]
+    return template.format(**fields)
@@ -0,0 +1,68 @@
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses identical concurrent calls into one.
+
+    The first caller for a key runs the function; callers arriving with the same
+    key while it is in flight wait and receive the same result (or exception).
+    Nothing is cached: once the call returns, the next caller runs it again.
+
+    Usage:
+        flight = SingleFlight()
+        slots = flight.do(("primary", "2025-11-26"), find_free_slots_for_date, service, "2025-11-26")
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.requests = 0   # calls to do()
+        self.upstream = 0   # calls that actually ran the function
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            self.requests += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.upstream += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        """Request counts and the share of requests served by another caller's call."""
+        with self._lock:
+            requests, upstream = self.requests, self.upstream
+        coalesced = requests - upstream
+        return {
+            "requests": requests,
+            "upstream": upstream,
+            "coalesced": coalesced,
+            "coalescing_ratio": coalesced / requests if requests else 0.0,
+        }
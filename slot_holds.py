@@ -0,0 +1,216 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+from calendar_functions import TIMEZONE, _execute
+
+
+class InMemoryHoldStore:
+    """Holds for one process; enough when all sessions run in the same worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._holds = {}  # (calendar_id, date_str) -> {(start, end): (session_id, expires_at)}
+
+    def acquire(self, calendar_id, date_str, start, end, session_id, ttl):
+        now = time.time()
+        with self._lock:
+            day = self._holds.setdefault((calendar_id, date_str), {})
+            for (s, e), (owner, expires_at) in list(day.items()):
+                if expires_at <= now:
+                    del day[(s, e)]
+                elif owner != session_id and s < end and e > start:
+                    return False
+            day[(start, end)] = (session_id, now + ttl)
+            return True
+
+    def transfer(self, session_id, owner, ttl):
+        expires_at = time.time() + ttl
+        with self._lock:
+            for day in self._holds.values():
+                for interval, (held_by, _) in list(day.items()):
+                    if held_by == session_id:
+                        day[interval] = (owner, expires_at)
+
+    def release(self, session_id):
+        with self._lock:
+            for day in self._holds.values():
+                for interval, (owner, _) in list(day.items()):
+                    if owner == session_id:
+                        del day[interval]
+
+    def held(self, calendar_id, date_str):
+        now = time.time()
+        with self._lock:
+            return [(s, e, owner) for (s, e), (owner, expires_at) in self._holds.get((calendar_id, date_str), {}).items()
+                    if expires_at > now]
+
+
+class SQLiteHoldStore:
+    """
+    Holds shared by every process using the same SQLite file.
+
+    Local stand-in for a shared store such as Redis: any object with the same
+    acquire/transfer/release/held methods can be passed to SlotHolds instead.
+    """
+
+    def __init__(self, path: str = "slot_holds.sqlite3"):
+        self._lock = threading.Lock()
+        # autocommit mode, so acquire() can take the write lock with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS holds (
+                calendar_id TEXT NOT NULL,
+                date_str TEXT NOT NULL,
+                start_min INTEGER NOT NULL,
+                end_min INTEGER NOT NULL,
+                session_id TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (calendar_id, date_str, start_min, end_min)
+            );
+            """
+        )
+
+    def acquire(self, calendar_id, date_str, start, end, session_id, ttl):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM holds WHERE expires_at <= ?", (now,))
+                conflict = self._conn.execute(
+                    "SELECT 1 FROM holds WHERE calendar_id = ? AND date_str = ? AND session_id != ?"
+                    " AND start_min < ? AND end_min > ? LIMIT 1",
+                    (calendar_id, date_str, session_id, end, start),
+                ).fetchone()
+                if not conflict:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO holds VALUES (?, ?, ?, ?, ?, ?)",
+                        (calendar_id, date_str, start, end, session_id, now + ttl),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return not conflict
+
+    def transfer(self, session_id, owner, ttl):
+        with self._lock:
+            self._conn.execute("UPDATE holds SET session_id = ?, expires_at = ? WHERE session_id = ?",
+                               (owner, time.time() + ttl, session_id))
+
+    def release(self, session_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM holds WHERE session_id = ?", (session_id,))
+
+    def held(self, calendar_id, date_str):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT start_min, end_min, session_id FROM holds"
+                " WHERE calendar_id = ? AND date_str = ? AND expires_at > ?",
+                (calendar_id, date_str, time.time()),
+            ).fetchall()
+
+
+class SlotHolds:
+    """
+    Short-lived reservations of offered slots, so two sessions can't book the same one.
+
+    A session holds the slot the patient picks for `ttl` seconds; other sessions
+    no longer see it in their results. At booking time only the held interval is
+    re-checked against the calendar (interval_still_free) rather than re-reading
+    the whole day.
+
+    Usage:
+        holds = SlotHolds(SQLiteHoldStore("slot_holds.sqlite3"))
+        agent = BookingAgent(llm, slot_holds=holds)
+    """
+
+    def __init__(self, store=None, ttl: float = 300.0, pinned_ttl: float = 24 * 3600.0):
+        """
+        Args:
+            store: InMemoryHoldStore (default), SQLiteHoldStore or a compatible shared store.
+            ttl: seconds a hold lasts unless renewed.
+            pinned_ttl: upper bound for a pinned hold, in case its release never comes.
+        """
+        self.store = store or InMemoryHoldStore()
+        self.ttl = ttl
+        self.pinned_ttl = pinned_ttl
+
+    def hold(self, session_id, calendar_id, date_str, start, end):
+        """Hold [start, end) minutes for session_id, replacing its earlier holds; False if taken."""
+        self.store.release(session_id)
+        return self.store.acquire(calendar_id, date_str, start, end, session_id, self.ttl)
+
+    def renew(self, session_id, calendar_id, date_str, start, end):
+        """Extend the session's hold; False if it expired and someone else took the slot."""
+        return self.store.acquire(calendar_id, date_str, start, end, session_id, self.ttl)
+
+    def pin(self, session_id, owner):
+        """
+        Hand the session's hold over to `owner` (e.g. a booking key) until release(owner).
+
+        For bookings the journal writes later: the slot stays hidden from other
+        sessions until the event is in the calendar, while the session itself is
+        free to hold another slot.
+        """
+        self.store.transfer(session_id, owner, self.pinned_ttl)
+
+    def release(self, session_id):
+        self.store.release(session_id)
+
+    def filter(self, slots, session_id, calendar_for):
+        """
+        SlotList without the slots other sessions hold.
+
+        Args:
+            slots: SlotList of one day.
+            session_id: the asking session; its own holds stay visible.
+            calendar_for: (start, end) -> calendar_id the slot belongs to.
+        """
+        date_str = slots.date.strftime("%Y-%m-%d")
+        held = {}
+        for start, end in slots.minutes():
+            calendar_id = calendar_for(start, end)
+            if calendar_id not in held:
+                held[calendar_id] = [(s, e) for s, e, owner in self.store.held(calendar_id, date_str)
+                                     if owner != session_id]
+        if not any(held.values()):
+            return slots
+        return slots.without(
+            lambda start, end: any(s < end and e > start for s, e in held[calendar_for(start, end)])
+        )
+
+
+def interval_still_free(service, calendar_id, date_str, start, end, event_id=None):
+    """
+    True if [start, end) minutes of date_str are free in the calendar.
+
+    One FreeBusy query for just that interval. When event_id is given and the
+    interval is busy, the slot still counts as free if the busy event is that
+    one, i.e. an earlier attempt of the same booking already landed.
+    """
+    tz = pytz.timezone(TIMEZONE)
+    midnight = tz.localize(datetime.combine(datetime.strptime(date_str, "%Y-%m-%d").date(), datetime.min.time()))
+    result = _execute(service.freebusy().query(body={
+        "timeMin": (midnight + timedelta(minutes=start)).isoformat(),
+        "timeMax": (midnight + timedelta(minutes=end)).isoformat(),
+        "timeZone": TIMEZONE,
+        "items": [{"id": calendar_id}],
+    }))
+    calendar = result.get('calendars', {}).get(calendar_id, {})
+    if calendar.get('errors'):
+        raise RuntimeError(f"FreeBusy failed for {calendar_id}: {calendar['errors']}")
+    if not calendar.get('busy'):
+        return True
+    if event_id is None:
+        return False
+    try:
+        existing = _execute(service.events().get(calendarId=calendar_id, eventId=event_id))
+    except Exception:
+        return False
+    return existing.get("status") != "cancelled"
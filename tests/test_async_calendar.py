@@ -0,0 +1,108 @@
+"""
+async_calendar against the local fake server (local_calendar.mock_transport).
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_calendar import (  # noqa: E402
+    AsyncCalendarClient,
+    create_appointment_event_async,
+    find_free_slots_for_date_async,
+    get_events_for_date_async,
+)
+from calendar_functions import _appointment_event_body, booking_key  # noqa: E402
+from local_calendar import LocalCalendarService, mock_transport  # noqa: E402
+
+DATE = "2030-01-07"  # a Monday, far enough ahead that no slot is in the past
+
+
+def run(service, coroutine_fn):
+    async def main():
+        async with AsyncCalendarClient(lambda: "test-token", transport=mock_transport(service)) as client:
+            return await coroutine_fn(client)
+    return asyncio.run(main())
+
+
+def book(service, time_str, date_str=DATE, calendar_id="primary", duration_minutes=30):
+    event_id = booking_key(calendar_id, "Existing", date_str, time_str)
+    body = _appointment_event_body("Existing", date_str, time_str, "", duration_minutes, event_id)
+    return service.insert_event(calendar_id, body)
+
+
+def test_get_events_for_date_lists_only_that_day():
+    service = LocalCalendarService()
+    event = book(service, "10:00")
+    book(service, "10:00", date_str="2030-01-08")
+
+    events = run(service, lambda client: get_events_for_date_async(client, DATE))
+
+    assert [e["id"] for e in events] == [event["id"]]
+
+
+def test_get_events_for_date_follows_pages():
+    service = LocalCalendarService()
+    for minute in range(0, 300 * 2, 2):
+        book(service, f"{minute // 60:02d}:{minute % 60:02d}", duration_minutes=1)
+
+    events = run(service, lambda client: get_events_for_date_async(client, DATE))
+
+    assert len(events) == 300  # more than one page of PAGE_SIZE
+
+
+def test_find_free_slots_uses_freebusy():
+    service = LocalCalendarService()
+    book(service, "09:00", duration_minutes=60)
+
+    date_str, hours, slots = run(service, lambda client: find_free_slots_for_date_async(client, DATE))
+
+    assert date_str == DATE
+    assert slots[0] == ("10:00", "10:30")
+    assert len(slots) == 16  # 10:00-18:00 in 30 minute slots
+
+
+def test_find_free_slots_falls_back_to_events_when_freebusy_fails():
+    service = LocalCalendarService()
+    # FreeBusy reports notFound for a calendar that has never been written to
+    date_str, _, slots = run(service, lambda client: find_free_slots_for_date_async(client, DATE, "dr-new"))
+
+    assert date_str == DATE
+    assert len(slots) == 18
+
+
+def test_create_appointment_event_inserts_once():
+    service = LocalCalendarService()
+
+    first = run(service, lambda client: create_appointment_event_async(client, "Ann", DATE, "11:00", "checkup"))
+    # a retry of the same booking hits 409 and returns the existing event
+    second = run(service, lambda client: create_appointment_event_async(client, "Ann", DATE, "11:00", "checkup"))
+
+    assert first["id"] == second["id"] == booking_key("primary", "Ann", DATE, "11:00")
+    assert len(service.list_events("primary", None, None, None, None, 250, False)["items"]) == 1
+
+
+def test_create_appointment_event_restores_a_cancelled_booking():
+    service = LocalCalendarService()
+    event = run(service, lambda client: create_appointment_event_async(client, "Ann", DATE, "11:00", "checkup"))
+    service.delete_event("primary", event["id"])
+
+    again = run(service, lambda client: create_appointment_event_async(client, "Ann", DATE, "11:00", "checkup"))
+
+    assert again["id"] == event["id"]
+    assert again["status"] == "confirmed"
+
+
+def test_many_requests_in_flight():
+    service = LocalCalendarService()
+
+    async def book_all(client):
+        return await asyncio.gather(*(
+            create_appointment_event_async(client, f"Patient {i}", DATE, f"{9 + i // 4:02d}:{i % 4 * 15:02d}", "")
+            for i in range(32)
+        ))
+
+    events = run(service, book_all)
+
+    assert len({e["id"] for e in events}) == 32
@@ -0,0 +1,80 @@
+"""
+The chat agent, the export and the bulk table must offer the same slots.
+"""
+import os
+import random
+import sys
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytz  # noqa: E402
+
+from bulk_availability import availability_table, fetch_busy_window  # noqa: E402
+from calendar_functions import TIMEZONE, find_free_slots_for_date  # noqa: E402
+from export_availability import iter_free_slots  # noqa: E402
+from local_calendar import LocalCalendarService  # noqa: E402
+
+FIRST_DAY = date(2030, 1, 7)
+
+
+def insert(service, calendar_id, start, end, event_id):
+    service.insert_event(calendar_id, {
+        "id": event_id,
+        "start": {"dateTime": start.isoformat()},
+        "end": {"dateTime": end.isoformat()},
+    })
+
+
+def agent_rows(service, calendar_ids, days, slot_minutes):
+    rows = []
+    for calendar_id in calendar_ids:
+        for offset in range(days):
+            date_str = (FIRST_DAY + timedelta(days=offset)).strftime("%Y-%m-%d")
+            found, _, slots = find_free_slots_for_date(service, date_str, calendar_id,
+                                                       slot_minutes=slot_minutes, max_days_ahead=0)
+            rows.extend((calendar_id, found, start, end) for start, end in slots)
+    return rows
+
+
+def export_rows(service, calendar_ids, days, slot_minutes):
+    chunks = iter_free_slots(service, calendar_ids, FIRST_DAY, FIRST_DAY + timedelta(days=days - 1),
+                             slot_minutes=slot_minutes, chunk_days=3)
+    return [row for chunk in chunks for row in chunk]
+
+
+def table_rows(service, calendar_ids, days, slot_minutes):
+    date_str = FIRST_DAY.strftime("%Y-%m-%d")
+    busy = fetch_busy_window(service, calendar_ids, date_str, days)
+    return list(availability_table(busy, date_str, days, slot_minutes=slot_minutes).to_rows())
+
+
+def test_slots_start_where_the_gap_starts():
+    service = LocalCalendarService()
+    tz = pytz.timezone(TIMEZONE)
+    day = tz.localize(datetime.combine(FIRST_DAY, datetime.min.time()))
+    insert(service, "primary", day + timedelta(hours=9, minutes=10), day + timedelta(hours=9, minutes=25), "a1")
+
+    rows = agent_rows(service, ["primary"], 1, 30)
+
+    assert [start for _, _, start, _ in rows[:3]] == ["09:25", "09:55", "10:25"]
+    assert export_rows(service, ["primary"], 1, 30) == rows
+    assert table_rows(service, ["primary"], 1, 30) == rows
+
+
+def test_agent_export_and_table_agree():
+    service = LocalCalendarService()
+    tz = pytz.timezone(TIMEZONE)
+    calendar_ids = ["primary", "dr-b"]
+    days = 5
+    rng = random.Random(7)
+    for n in range(120):
+        day = tz.localize(datetime.combine(FIRST_DAY + timedelta(days=rng.randrange(days)), datetime.min.time()))
+        start = day + timedelta(seconds=rng.randrange(7 * 3600, 19 * 3600))
+        end = start + timedelta(seconds=rng.randrange(60, 90 * 60))
+        insert(service, calendar_ids[n % 2], start, end, f"ev{n}")
+
+    for slot_minutes in (15, 30, 60):
+        rows = sorted(agent_rows(service, calendar_ids, days, slot_minutes))
+        assert sorted(export_rows(service, calendar_ids, days, slot_minutes)) == rows
+        assert sorted(table_rows(service, calendar_ids, days, slot_minutes)) == rows
@@ -0,0 +1,99 @@
+"""
+EventCache behind find_free_slots_for_date, against the local calendar.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from api_guard import CircuitOpenError  # noqa: E402
+from calendar_functions import (  # noqa: E402
+    _appointment_event_body,
+    booking_key,
+    create_appointment_event,
+    find_free_slots_for_date,
+)
+from event_cache import EventCache  # noqa: E402
+from local_calendar import LocalCalendarService  # noqa: E402
+
+DATE = "2030-01-07"
+
+
+class FlakyCalendar(LocalCalendarService):
+    """Local calendar whose events().list can be switched to fail like an open circuit."""
+
+    down = False
+
+    def list_events(self, *args):
+        if self.down:
+            raise CircuitOpenError("Calendar API circuit is open; not calling the API")
+        return super().list_events(*args)
+
+
+def book_outside_app(service, time_str, duration_minutes=30):
+    event_id = booking_key("primary", "Walk-in", DATE, time_str)
+    service.insert_event("primary", _appointment_event_body("Walk-in", DATE, time_str, "", duration_minutes, event_id))
+
+
+def first_slot(service, cache):
+    return find_free_slots_for_date(service, DATE, max_days_ahead=0, cache=cache)[2][0]
+
+
+@pytest.fixture
+def cache():
+    cache = EventCache(":memory:", min_sync_interval=0)
+    yield cache
+    cache.close()
+
+
+def test_changes_are_pulled_incrementally(cache):
+    service = LocalCalendarService()
+    assert first_slot(service, cache) == ("09:00", "09:30")
+
+    book_outside_app(service, "09:00", duration_minutes=60)
+
+    assert first_slot(service, cache) == ("10:00", "10:30")
+
+
+def test_invalidated_sync_token_does_a_full_resync(cache):
+    service = LocalCalendarService()
+    first_slot(service, cache)
+    cache._conn.execute("UPDATE sync_state SET sync_token = 'stale'")
+    book_outside_app(service, "09:00")
+
+    assert first_slot(service, cache) == ("09:30", "10:00")
+
+
+def test_bookings_skip_the_sync_interval():
+    service = LocalCalendarService()
+    cache = EventCache(":memory:", min_sync_interval=3600)
+    try:
+        first_slot(service, cache)
+        book_outside_app(service, "09:00")
+        assert first_slot(service, cache) == ("09:00", "09:30")  # trusted local copy
+
+        create_appointment_event(service, "Ann", DATE, "09:30", "checkup")
+
+        assert first_slot(service, cache) == ("10:00", "10:30")
+    finally:
+        cache.close()
+
+
+def test_local_copy_answers_while_the_api_is_down(cache):
+    service = FlakyCalendar()
+    book_outside_app(service, "09:00")
+    first_slot(service, cache)
+
+    service.down = True
+
+    assert first_slot(service, cache) == ("09:30", "10:00")
+
+
+def test_nothing_to_answer_from_before_the_first_sync(cache):
+    service = FlakyCalendar()
+    service.down = True
+
+    with pytest.raises(CircuitOpenError):
+        first_slot(service, cache)
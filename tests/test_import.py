@@ -0,0 +1,44 @@
+"""
+Importing Booking_Agent_class must be cheap and side-effect free: no
+credentials, no Google or langchain packages, no files written.
+"""
+import os
+import subprocess
+import sys
+import textwrap
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_BUDGET_S = 0.3  # cold import target for the UI's first render
+
+SCRIPT = textwrap.dedent(
+    """
+    import importlib.abc
+    import sys
+    import time
+
+    BLOCKED = {"google", "googleapiclient", "google_auth_oauthlib", "google_auth_httplib2",
+               "langchain", "langchain_core", "langchain_ollama", "streamlit"}
+
+    class Block(importlib.abc.MetaPathFinder):
+        def find_spec(self, name, path=None, target=None):
+            if name.split(".")[0] in BLOCKED:
+                raise ImportError(f"{name} is not available")
+            return None
+
+    sys.meta_path.insert(0, Block())
+    start = time.perf_counter()
+    import Booking_Agent_class
+    print(time.perf_counter() - start)
+    """
+)
+
+
+def test_import_without_credentials_or_client_libraries(tmp_path):
+    env = {**os.environ, "PYTHONPATH": REPO}
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT], cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    elapsed = float(result.stdout.strip().splitlines()[-1])
+    assert elapsed < IMPORT_BUDGET_S, f"import took {elapsed * 1000:.0f} ms"
+    assert list(tmp_path.iterdir()) == []  # no token, journal or cache files
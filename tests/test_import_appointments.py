@@ -0,0 +1,84 @@
+"""
+import_appointments against the local calendar (local_calendar.LocalCalendarService).
+"""
+import csv
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calendar_functions import booking_key  # noqa: E402
+from import_appointments import import_appointments, read_rows  # noqa: E402
+from local_calendar import LocalCalendarService  # noqa: E402
+
+DATE = "2030-01-07"
+
+
+def write_jsonl(path, lines):
+    with open(path, "w") as f:
+        for line in lines:
+            f.write((line if isinstance(line, str) else json.dumps(line)) + "\n")
+    return str(path)
+
+
+def read_report(path):
+    with open(path, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def run(service, tmp_path, source, batch_size=2):
+    report, checkpoint = tmp_path / "report.csv", tmp_path / "checkpoint.json"
+    counts = import_appointments(service, read_rows(source), str(report), str(checkpoint), batch_size)
+    return counts, read_report(report)
+
+
+def test_bad_rows_are_reported_and_the_rest_imported(tmp_path):
+    service = LocalCalendarService()
+    source = write_jsonl(tmp_path / "in.jsonl", [
+        {"patient_name": "Ann", "date": DATE, "time": "09:00"},
+        {"patient_name": "Bob", "date": DATE, "time": 930},
+        {"patient_name": 12345, "date": DATE, "time": "10:00-11:00"},
+        "{not json",
+        ["a", "list"],
+        {"patient_name": "Cat", "date": DATE, "time": ["11:00"]},
+        {"patient_name": "Dan", "date": DATE},
+        {"patient_name": "Eve", "date": DATE, "time": "12:00", "duration_minutes": 45},
+    ])
+
+    (ok, failed), report = run(service, tmp_path, source)
+
+    assert (ok, failed) == (3, 5)
+    assert [r["row"] for r in report] == [str(n) for n in range(1, 9)]
+    assert [r["status"] for r in report] == ["ok", "error", "ok", "error", "error", "error", "error", "ok"]
+    assert "time must be text" in report[5]["error"]
+    assert "missing field 'time'" in report[6]["error"]
+    event = service.get_event("primary", booking_key("primary", "12345", DATE, "10:00"))
+    assert event["end"]["dateTime"].startswith(f"{DATE}T11:00")
+
+
+def test_rerun_without_checkpoint_reports_existing_events(tmp_path):
+    service = LocalCalendarService()
+    source = write_jsonl(tmp_path / "in.jsonl", [
+        {"patient_name": "Ann", "date": DATE, "time": "09:00"},
+        {"patient_name": "Bob", "date": DATE, "time": "09:30"},
+        {"patient_name": "Cat", "date": DATE, "time": "10:00"},
+    ])
+    run(service, tmp_path, source)
+    os.remove(tmp_path / "checkpoint.json")
+
+    (ok, failed), report = run(service, tmp_path, source)
+
+    assert (ok, failed) == (3, 0)
+    assert [r["status"] for r in report] == ["exists"] * 3
+
+
+def test_resume_skips_rows_already_done(tmp_path):
+    service = LocalCalendarService()
+    rows = [{"patient_name": f"P{n}", "date": DATE, "time": f"{9 + n}:00"} for n in range(4)]
+    run(service, tmp_path, write_jsonl(tmp_path / "in.jsonl", rows[:2]))
+
+    (ok, failed), report = run(service, tmp_path, write_jsonl(tmp_path / "in.jsonl", rows))
+
+    assert (ok, failed) == (2, 0)
+    assert [(r["row"], r["status"]) for r in report] == [("1", "ok"), ("2", "ok"), ("3", "ok"), ("4", "ok")]